@@ -5,7 +5,9 @@ Einfache, funktionsfähige Implementierung ohne Overengineering
 
 import logging
 import re
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
 from pathlib import Path
 try:
     import PyPDF2
@@ -19,6 +21,17 @@ except ModuleNotFoundError:  # pragma: no cover - optional dependency
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class ParsedDocument:
+    """Ergebnis eines einzigen Parser-Durchlaufs über ein Dokument"""
+
+    text: str = ""
+    tables: List[List[List[str]]] = field(default_factory=list)
+    metadata: Dict = field(default_factory=dict)
+    pages: List[str] = field(default_factory=list)
+
+
 class DocumentParser:
     """
     Einfacher, funktionsfähiger PDF-Parser für TGA-Dokumente
@@ -91,10 +104,7 @@ class DocumentParser:
                     if page_tables:
                         for table in page_tables:
                             # Filtere leere Zeilen
-                            clean_table = []
-                            for row in table:
-                                if row and any(cell and str(cell).strip() for cell in row):
-                                    clean_table.append([str(cell).strip() if cell else "" for cell in row])
+                            clean_table = self._clean_table(table)
                             if clean_table:
                                 tables.append(clean_table)
 
@@ -103,12 +113,59 @@ class DocumentParser:
             
         return tables
     
-    def find_heizlast_data(self, file_path: str) -> Dict:
+    def parse_once(self, file_path: str) -> ParsedDocument:
+        """
+        Öffnet das PDF genau einmal und liefert Text, Tabellen und Metadaten
+        """
+        if not self.can_parse(file_path):
+            return ParsedDocument()
+
+        pages: List[str] = []
+        tables: List[List[List[str]]] = []
+
+        if pdfplumber is not None:
+            try:
+                with pdfplumber.open(file_path) as pdf:
+                    for page in pdf.pages:
+                        pages.append(page.extract_text() or "")
+                        for table in page.extract_tables() or []:
+                            clean_table = self._clean_table(table)
+                            if clean_table:
+                                tables.append(clean_table)
+            except Exception as e:
+                logger.warning(f"pdfplumber failed for {file_path}: {e}")
+                pages, tables = [], []
+
+        text = "".join(page_text + "\n" for page_text in pages if page_text)
+        if not text.strip():
+            # Fallback auf PyPDF2 wie in extract_text
+            text = self.extract_text(file_path) if PyPDF2 is not None else ""
+
+        return ParsedDocument(
+            text=text,
+            tables=tables,
+            metadata=self._metadata_from_text(text),
+            pages=pages,
+        )
+
+    def _clean_table(self, table: List[List[Optional[str]]]) -> List[List[str]]:
+        """Filtert leere Zeilen und normalisiert Zellen einer Tabelle"""
+        return [
+            [str(cell).strip() if cell else "" for cell in row]
+            for row in table
+            if row and any(cell and str(cell).strip() for cell in row)
+        ]
+
+    def _as_parsed(self, source: Union[str, ParsedDocument]) -> ParsedDocument:
+        return source if isinstance(source, ParsedDocument) else self.parse_once(source)
+
+    def find_heizlast_data(self, source: Union[str, ParsedDocument]) -> Dict:
         """
         Sucht nach Heizlastdaten in PDF
         Einfache Regex-basierte Erkennung
         """
-        text = self.extract_text(file_path)
+        parsed = self._as_parsed(source)
+        text = parsed.text
         if not text:
             return {}
             
@@ -133,8 +190,7 @@ class DocumentParser:
             heizlast_data['gesamt_heizlast_unit'] = gesamt_match.group(2).upper()
         
         # Suche nach Raumdaten in Tabellen
-        tables = self.extract_tables(file_path)
-        for table in tables:
+        for table in parsed.tables:
             if len(table) > 1:  # Header + mindestens eine Datenzeile
                 raum_data = self._parse_heizlast_table(table)
                 heizlast_data['raeume'].extend(raum_data)
@@ -223,12 +279,13 @@ class DocumentParser:
                     return i
         return None
     
-    def find_luftmengen_data(self, file_path: str) -> Dict:
+    def find_luftmengen_data(self, source: Union[str, ParsedDocument]) -> Dict:
         """
         Sucht nach Luftmengendaten in PDF
         Ähnlich wie Heizlastdaten, aber für RLT
         """
-        text = self.extract_text(file_path)
+        parsed = self._as_parsed(source)
+        text = parsed.text
         if not text:
             return {}
             
@@ -247,8 +304,7 @@ class DocumentParser:
             luftmengen_data['anlagen'].append(anlage)
         
         # Parse Tabellen für Raumlufttechnik
-        tables = self.extract_tables(file_path)
-        for table in tables:
+        for table in parsed.tables:
             if len(table) > 1:
                 raum_data = self._parse_luftmengen_table(table)
                 luftmengen_data['raeume'].extend(raum_data)
@@ -302,12 +358,17 @@ class DocumentParser:
         
         return raeume
     
-    def extract_metadata(self, file_path: str) -> Dict:
+    def extract_metadata(self, source: Union[str, ParsedDocument]) -> Dict:
         """
         Extrahiert Metadaten aus Planköpfen
         Sucht nach typischen Plan-Informationen
         """
-        text = self.extract_text(file_path)
+        if isinstance(source, ParsedDocument):
+            return source.metadata
+        return self._metadata_from_text(self.extract_text(source))
+
+    def _metadata_from_text(self, text: str) -> Dict:
+        """Sucht Plan-Nummer, Revision, Datum und Maßstab im Text"""
         if not text:
             return {}
             
@@ -407,6 +468,15 @@ class DocumentParser:
 
         return {}
 
+@lru_cache(maxsize=1)
+def get_parser() -> DocumentParser:
+    """
+    Gemeinsame Parser-Instanz für alle Services
+    Der Parser hält keinen veränderlichen Zustand und ist damit threadsicher
+    """
+    return DocumentParser()
+
+
 # Einfache Testfunktion
 def test_parser():
     """Einfacher Test für den Parser"""
@@ -7,7 +7,7 @@ from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional
 
 from .checks import EVALUATORS
 from .checks.kg420_heating import GEWERK as KG420_CODE
-from .document_parser import DocumentParser
+from .document_parser import get_parser
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +34,7 @@ async def evaluate_heating(documents: Iterable[Mapping[str, Any]], projekt_typ:
 async def build_heating_context(
     documents: Iterable[Mapping[str, Any]], projekt_typ: str
 ) -> MutableMapping[str, Any]:
-    parser = DocumentParser()
+    parser = get_parser()
     context: MutableMapping[str, Any] = {
         "projekt_typ": projekt_typ,
         "documents": [],
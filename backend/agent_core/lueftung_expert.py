@@ -7,7 +7,7 @@ from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional
 
 from .checks import EVALUATORS
 from .checks.kg430_ventilation import GEWERK as KG430_CODE
-from .document_parser import DocumentParser
+from .document_parser import get_parser
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ async def evaluate_ventilation(documents: Iterable[Mapping[str, Any]], projekt_t
 async def build_ventilation_context(
     documents: Iterable[Mapping[str, Any]], projekt_typ: str
 ) -> MutableMapping[str, Any]:
-    parser = DocumentParser()
+    parser = get_parser()
     context: MutableMapping[str, Any] = {
         "projekt_typ": projekt_typ,
         "documents": [],
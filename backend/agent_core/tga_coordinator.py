@@ -12,10 +12,12 @@ import re
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Tuple
+
+import numpy as np
 
 from .checks.common import Finding as RuleFinding
-from .document_parser import DocumentParser
+from .document_parser import get_parser
 from .heizung_expert import build_heating_context as build_heating_pipeline_context
 from .lueftung_expert import build_ventilation_context as build_ventilation_pipeline_context
 from .tga_pipeline import (
@@ -32,6 +34,43 @@ from .tga_pipeline import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Obergrenze für die Anzahl Boxpaare, die pro Block gleichzeitig verglichen werden
+_KOLLISION_PAARE_PRO_BLOCK = 1 << 20
+
+
+def _ueberlappende_boxpaare(boxen: np.ndarray) -> Iterator[Tuple[int, int, float, float, float]]:
+    """Liefert alle Paare i < j überlappender Boxen mit der Überdeckung je Achse.
+
+    ``boxen`` hat die Form (N, 6) mit den Spalten x_min, x_max, y_min, y_max,
+    z_min, z_max. Der Vergleich läuft blockweise über NumPy-Broadcasting statt
+    über eine Python-Doppelschleife. Boxen ohne Höhenangabe (z = 0) gelten
+    untereinander als in 2D überlappend.
+    """
+    anzahl = len(boxen)
+    flach = (boxen[:, 4] == 0.0) & (boxen[:, 5] == 0.0)
+    block = max(1, _KOLLISION_PAARE_PRO_BLOCK // max(anzahl, 1))
+
+    for start in range(0, anzahl, block):
+        a = boxen[start:start + block, None, :]
+        b = boxen[None, :, :]
+        x = np.minimum(a[..., 1], b[..., 1]) - np.maximum(a[..., 0], b[..., 0])
+        y = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 2], b[..., 2])
+        z = np.minimum(a[..., 5], b[..., 5]) - np.maximum(a[..., 4], b[..., 4])
+        beide_flach = flach[start:start + block, None] & flach[None, :]
+
+        treffer = (x > 0) & (y > 0) & ((z > 0) | beide_flach)
+        zeilen, spalten = np.nonzero(treffer)
+        oben = spalten > zeilen + start
+        for zeile, spalte in zip(zeilen[oben].tolist(), spalten[oben].tolist()):
+            yield (
+                start + zeile,
+                spalte,
+                float(x[zeile, spalte]),
+                float(y[zeile, spalte]),
+                max(float(z[zeile, spalte]), 0.0),
+            )
+
+
 class ProjectType(Enum):
     """Gebäudetypen für spezifische TGA-Anforderungen"""
     RESIDENTIAL = "wohngebaeude"
@@ -122,7 +161,7 @@ class TGACoordinator:
     def __init__(self):
         self.aktive_auftraege: Dict[str, PruefAuftrag] = {}
         self.ergebnisse: Dict[str, List[Finding]] = {}
-        self._parser = DocumentParser()
+        self._parser = get_parser()
         
     async def starte_pruefung(self, auftrag: PruefAuftrag) -> str:
         """
@@ -222,12 +261,12 @@ class TGACoordinator:
         
         for dokument in auftrag.dokumente:
             # Formal Compliance Agent würde hier aufgerufen
-            dokument_befunde = await self._pruefe_vdi_6026_konformitaet(dokument, auftrag)
+            dokument_befunde = self._pruefe_vdi_6026_konformitaet(dokument, auftrag)
             befunde.extend(dokument_befunde)
         
         return befunde
     
-    async def _pruefe_vdi_6026_konformitaet(self, dokument: Document, auftrag: PruefAuftrag) -> List[Finding]:
+    def _pruefe_vdi_6026_konformitaet(self, dokument: Document, auftrag: PruefAuftrag) -> List[Finding]:
         """Prüft VDI 6026 Konformität"""
         befunde = []
 
@@ -1087,13 +1126,14 @@ class TGACoordinator:
         befunde = []
         
         # Cross-Discipline Coordination Agent würde hier aufgerufen
-        befunde.extend(await self._pruefe_kollisionen(auftrag))
-        befunde.extend(await self._pruefe_schnittstellen(auftrag))
-        befunde.extend(await self._pruefe_sud_planung(auftrag))
+        # Die Einzelprüfungen sind reine Rechenarbeit und laufen synchron
+        befunde.extend(self._pruefe_kollisionen(auftrag))
+        befunde.extend(self._pruefe_schnittstellen(auftrag))
+        befunde.extend(self._pruefe_sud_planung(auftrag))
         
         return befunde
     
-    async def _pruefe_kollisionen(self, auftrag: PruefAuftrag) -> List[Finding]:
+    def _pruefe_kollisionen(self, auftrag: PruefAuftrag) -> List[Finding]:
         """Prüft auf geometrische Kollisionen zwischen Gewerken"""
         geometrie_eintraege: List[Dict[str, Any]] = []
 
@@ -1205,88 +1245,73 @@ class TGACoordinator:
                 )
 
         befunde: List[Finding] = []
+        if len(geometrie_eintraege) < 2:
+            return befunde
 
-        def _ueberlappung(a: Mapping[str, float], b: Mapping[str, float]) -> Optional[Dict[str, float]]:
-            def _axis_overlap(min_a: float, max_a: float, min_b: float, max_b: float) -> Optional[Tuple[float, float]]:
-                start = max(min_a, min_b)
-                end = min(max_a, max_b)
-                if end <= start:
-                    return None
-                return (start, end)
-
-            x_overlap = _axis_overlap(a["x_min"], a["x_max"], b["x_min"], b["x_max"])
-            y_overlap = _axis_overlap(a["y_min"], a["y_max"], b["y_min"], b["y_max"])
-            if not x_overlap or not y_overlap:
-                return None
-
-            z_overlap = _axis_overlap(a.get("z_min", 0.0), a.get("z_max", 0.0), b.get("z_min", 0.0), b.get("z_max", 0.0))
-            if z_overlap is None:
-                # Falls keine Höhenangaben vorhanden sind, wird Überschneidung in 2D angenommen
-                if a.get("z_max") == a.get("z_min") == 0.0 and b.get("z_max") == b.get("z_min") == 0.0:
-                    z_overlap = (0.0, 0.0)
-                else:
-                    return None
-
-            return {
-                "x": x_overlap[1] - x_overlap[0],
-                "y": y_overlap[1] - y_overlap[0],
-                "z": z_overlap[1] - z_overlap[0],
-            }
-
-        for index, eintrag_a in enumerate(geometrie_eintraege):
-            for eintrag_b in geometrie_eintraege[index + 1 :]:
-                dokument_a: Document = eintrag_a["dokument"]
-                dokument_b: Document = eintrag_b["dokument"]
+        boxen = np.array(
+            [
+                [
+                    eintrag["bbox"]["x_min"],
+                    eintrag["bbox"]["x_max"],
+                    eintrag["bbox"]["y_min"],
+                    eintrag["bbox"]["y_max"],
+                    eintrag["bbox"]["z_min"],
+                    eintrag["bbox"]["z_max"],
+                ]
+                for eintrag in geometrie_eintraege
+            ],
+            dtype=float,
+        )
 
-                if dokument_a.gewerk == dokument_b.gewerk:
-                    continue
+        for index_a, index_b, overlap_x, overlap_y, overlap_z in _ueberlappende_boxpaare(boxen):
+            eintrag_a = geometrie_eintraege[index_a]
+            eintrag_b = geometrie_eintraege[index_b]
+            dokument_a: Document = eintrag_a["dokument"]
+            dokument_b: Document = eintrag_b["dokument"]
 
-                level_a = eintrag_a.get("level")
-                level_b = eintrag_b.get("level")
-                if level_a and level_b and str(level_a).lower() != str(level_b).lower():
-                    continue
+            if dokument_a.gewerk == dokument_b.gewerk:
+                continue
 
-                overlap = _ueberlappung(eintrag_a["bbox"], eintrag_b["bbox"])
-                if not overlap:
-                    continue
+            level_a = eintrag_a.get("level")
+            level_b = eintrag_b.get("level")
+            if level_a and level_b and str(level_a).lower() != str(level_b).lower():
+                continue
 
-                flaechenueberdeckung = overlap["x"] * overlap["y"]
-                if flaechenueberdeckung <= 0:
-                    continue
+            flaechenueberdeckung = overlap_x * overlap_y
 
-                element_a = eintrag_a["element"]
-                element_b = eintrag_b["element"]
+            element_a = eintrag_a["element"]
+            element_b = eintrag_b["element"]
 
-                beschreibung = (
-                    f"Element {element_a.get('id') or element_a.get('name')} ({dokument_a.gewerk.value}) "
-                    f"überlappt mit {element_b.get('id') or element_b.get('name')} "
-                    f"({dokument_b.gewerk.value}). Überdeckung: {flaechenueberdeckung:.2f} m²"
-                )
+            beschreibung = (
+                f"Element {element_a.get('id') or element_a.get('name')} ({dokument_a.gewerk.value}) "
+                f"überlappt mit {element_b.get('id') or element_b.get('name')} "
+                f"({dokument_b.gewerk.value}). Überdeckung: {flaechenueberdeckung:.2f} m²"
+            )
 
-                if overlap["z"] > 0:
-                    beschreibung += f" bei einer vertikalen Überschneidung von {overlap['z']:.2f} m"
+            if overlap_z > 0:
+                beschreibung += f" bei einer vertikalen Überschneidung von {overlap_z:.2f} m"
 
-                plan_ref = f"{eintrag_a['plan_ref']} / {eintrag_b['plan_ref']}"
+            plan_ref = f"{eintrag_a['plan_ref']} / {eintrag_b['plan_ref']}"
 
-                befunde.append(
-                    Finding(
-                        id=f"kollision_{dokument_a.id}_{element_a.get('id')}_{dokument_b.id}_{element_b.get('id')}",
-                        document_id=dokument_a.id,
-                        gewerk=dokument_a.gewerk,
-                        kategorie="koordination",
-                        prioritaet="hoch",
-                        titel="Geometrische Kollision zwischen Gewerken",
-                        beschreibung=beschreibung,
-                        plan_referenz=plan_ref,
-                        empfehlung="Koordinationsmodell prüfen und Höhenlage abstimmen",
-                        agent_quelle="coordination_agent",
-                        konfidenz_score=0.85,
-                    )
+            befunde.append(
+                Finding(
+                    id=f"kollision_{dokument_a.id}_{element_a.get('id')}_{dokument_b.id}_{element_b.get('id')}",
+                    document_id=dokument_a.id,
+                    gewerk=dokument_a.gewerk,
+                    kategorie="koordination",
+                    prioritaet="hoch",
+                    titel="Geometrische Kollision zwischen Gewerken",
+                    beschreibung=beschreibung,
+                    plan_referenz=plan_ref,
+                    empfehlung="Koordinationsmodell prüfen und Höhenlage abstimmen",
+                    agent_quelle="coordination_agent",
+                    konfidenz_score=0.85,
                 )
+            )
 
         return befunde
 
-    async def _pruefe_schnittstellen(self, auftrag: PruefAuftrag) -> List[Finding]:
+    def _pruefe_schnittstellen(self, auftrag: PruefAuftrag) -> List[Finding]:
         """Prüft Schnittstellen zwischen Gewerken"""
         befunde: List[Finding] = []
 
@@ -1452,7 +1477,7 @@ class TGACoordinator:
 
         return befunde
 
-    async def _pruefe_sud_planung(self, auftrag: PruefAuftrag) -> List[Finding]:
+    def _pruefe_sud_planung(self, auftrag: PruefAuftrag) -> List[Finding]:
         """Prüft Schlitz- und Durchbruchsplanung"""
         befunde: List[Finding] = []
 
@@ -3,7 +3,7 @@ Database configuration and connection management
 """
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
@@ -31,13 +31,25 @@ if DATABASE_URL.startswith("sqlite"):
         poolclass=StaticPool,
         echo=False  # Set to True for SQL debugging
     )
+
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        # SQLite setzt ON DELETE CASCADE nur mit aktivierten Foreign Keys um
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 else:
     # PostgreSQL configuration for production
+    engine_options = {}
+    if DATABASE_URL.startswith("postgresql+psycopg2://"):
+        # Mehrzeilige INSERTs für Bulk-Operationen
+        engine_options["executemany_mode"] = "values_plus_batch"
     engine = create_engine(
         DATABASE_URL,
         pool_pre_ping=True,
         pool_recycle=300,
-        echo=False  # Set to True for SQL debugging
+        echo=False,  # Set to True for SQL debugging
+        **engine_options
     )
 
 # Session factory
@@ -2,8 +2,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import agent_tasks, upload_router, flowcalc_tasks, tga_router, knowledge_router
-from database import init_db
+from database import engine, init_db, SessionLocal
+from services.rag_service import migrate_json_embeddings
+from services.schema_migration import upgrade_schema
 import logging
+import os
 
 # Logging konfigurieren
 logging.basicConfig(level=logging.INFO)
@@ -24,12 +27,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# N+1-Erkennung nur in der Entwicklung (NPLUSONE_ENABLED=1, Paket nplusone)
+if os.getenv("NPLUSONE_ENABLED") == "1":
+    try:
+        import nplusone.ext.sqlalchemy  # noqa: F401 - registriert die SQLAlchemy-Listener
+        from nplusone.core import profiler
+    except ImportError:
+        logger.warning("NPLUSONE_ENABLED gesetzt, aber nplusone ist nicht installiert")
+    else:
+        class _LoggingProfiler(profiler.Profiler):
+            def notify(self, message):
+                if not message.match(self.whitelist):
+                    logger.warning("N+1-Abfrage erkannt: %s", message.message)
+
+        @app.middleware("http")
+        async def nplusone_middleware(request, call_next):
+            with _LoggingProfiler():
+                return await call_next(request)
+
 # Datenbank initialisieren beim Start
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting TGA-KI Platform...")
     init_db()
+    upgrade_schema(engine)
     logger.info("Database initialized")
+    with SessionLocal() as db:
+        migrate_json_embeddings(db)
 
 # Routen registrieren
 app.include_router(agent_tasks.router, prefix="/agent/tasks", tags=["Legacy Agents"])
@@ -2,7 +2,7 @@
 SQLAlchemy models for TGA platform
 """
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Boolean, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Boolean, ForeignKey, Index, LargeBinary, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON
 from database import Base
@@ -77,6 +77,11 @@ class Projekt(Base):
     dokumente = relationship("Dokument", back_populates="projekt", cascade="all, delete-orphan")
     pruefauftraege = relationship("PruefAuftrag", back_populates="projekt", cascade="all, delete-orphan")
     knowledge_chunks = relationship("KnowledgeChunk", back_populates="projekt", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Projektliste und Keyset-Pagination per Index-Scan statt Sortierung
+        Index("ix_projekt_erstellt_am", erstellt_am.desc()),
+    )
 
 class Dokument(Base):
     __tablename__ = "dokumente"
@@ -90,6 +95,8 @@ class Dokument(Base):
     revision = Column(String)
     file_size = Column(Integer)  # in bytes
     mime_type = Column(String)
+    status = Column(String, default="pending_index")  # "pending_index", "indexed", "index_failed"
+    content_sha256 = Column(String(64), index=True)  # Hash des Dateiinhalts für Duplikaterkennung
     erstellt_am = Column(DateTime, default=datetime.utcnow)
     
     # Foreign Keys
@@ -97,8 +104,13 @@ class Dokument(Base):
     
     # Relationships
     projekt = relationship("Projekt", back_populates="dokumente")
-    metadaten = relationship("DokumentMetadata", back_populates="dokument", uselist=False, cascade="all, delete-orphan")
-    knowledge_chunks = relationship("KnowledgeChunk", back_populates="dokument", cascade="all, delete-orphan")
+    metadaten = relationship("DokumentMetadata", back_populates="dokument", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    knowledge_chunks = relationship("KnowledgeChunk", back_populates="dokument", cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        # Letztes Upload je Projekt per Index-Scan
+        Index("ix_dokument_projekt_erstellt", "projekt_id", erstellt_am.desc()),
+    )
 
 class DokumentMetadata(Base):
     __tablename__ = "dokument_metadaten"
@@ -112,7 +124,7 @@ class DokumentMetadata(Base):
     verarbeitet_am = Column(DateTime, default=datetime.utcnow)
     
     # Foreign Keys
-    dokument_id = Column(String, ForeignKey("dokumente.id"), nullable=False)
+    dokument_id = Column(String, ForeignKey("dokumente.id", ondelete="CASCADE"), nullable=False)
     
     # Relationships
     dokument = relationship("Dokument", back_populates="metadaten")
@@ -159,7 +171,7 @@ class Befund(Base):
     erstellt_am = Column(DateTime, default=datetime.utcnow)
     
     # Optional: Bezug zu spezifischem Dokument
-    dokument_id = Column(String, ForeignKey("dokumente.id"))
+    dokument_id = Column(String, ForeignKey("dokumente.id", ondelete="SET NULL"))
     
     # Foreign Keys
     pruefauftrag_id = Column(String, ForeignKey("pruefauftraege.id"), nullable=False)
@@ -213,17 +225,27 @@ class KnowledgeChunk(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     projekt_id = Column(String, ForeignKey("projekte.id"), nullable=False)
-    dokument_id = Column(String, ForeignKey("dokumente.id"), nullable=False)
+    dokument_id = Column(String, ForeignKey("dokumente.id", ondelete="CASCADE"), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     chunk_type = Column(SQLEnum(KnowledgeChunkTypeEnum), nullable=False)
     chunk_text = Column(Text, nullable=False)
     source_reference = Column(JSON)
     embedding_model = Column(String)
-    embedding_vector = Column(Text)  # JSON-serialisierte Liste für SQLite-Kompatibilität
+    embedding_vector = Column(LargeBinary)  # float32-Bytes, siehe rag_service.serialize_embedding
     embedding_dimensions = Column(Integer)
+    embedding_status = Column(String, default="pending", index=True)  # "pending", "done", "failed"
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     projekt = relationship("Projekt", back_populates="knowledge_chunks")
     dokument = relationship("Dokument", back_populates="knowledge_chunks")
 
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    hash = Column(String, primary_key=True)  # emb:{model}:{sha256(text)}
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer)
+    vector = Column(LargeBinary, nullable=False)  # float32-Bytes
+    created_at = Column(DateTime, default=datetime.utcnow)
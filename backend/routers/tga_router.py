@@ -2,16 +2,16 @@
 TGA Router - API-Endpunkte für die TGA-Planprüfung
 """
 
+import asyncio
 import logging
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from fastapi.responses import FileResponse
-from typing import List, Optional
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 import os
-import shutil
 
 from agent_core.tga_coordinator import (
     TGACoordinator,
@@ -22,23 +22,48 @@ from agent_core.tga_coordinator import (
     GewerkeType
 )
 
-from database import get_db
+from database import SessionLocal, get_db
+from services.upload_writer import schreibe_upload
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Globale Instanz des TGA Coordinators
 tga_coordinator = TGACoordinator()
 
 logger = logging.getLogger(__name__)
 
+def _iso_now() -> str:
+    """Aktueller Zeitstempel als ISO-8601-String (UTC, Sekundenauflösung)"""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _uuid_batch(n: int) -> List[str]:
+    """Erzeugt n zufällige UUID4-Strings aus einem einzigen os.urandom-Aufruf"""
+    raw = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)) for i in range(n)]
+
+def _list_upload_dir(upload_dir: str) -> frozenset:
+    """Gibt die Namen aller Dateien im Upload-Verzeichnis zurück (leer, falls es fehlt)"""
+    try:
+        with os.scandir(upload_dir) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+# Gültige Gewerk-Codes für die Upload-Validierung
+_GEWERK_VALUES = frozenset(gewerk.value for gewerk in GewerkeType)
+
 # Pydantic Models für API
 class ProjectRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     projekt_name: str
     projekt_typ: ProjectType
     leistungsphase: LeistungsPhase
     beschreibung: Optional[str] = None
 
 class DocumentInfo(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     filename: str
     document_type: str
     gewerk: GewerkeType
@@ -46,6 +71,8 @@ class DocumentInfo(BaseModel):
     revision: Optional[str] = None
 
 class PruefungStartRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     projekt: ProjectRequest
     dokumente: List[DocumentInfo]
 
@@ -62,7 +89,7 @@ async def erstelle_projekt(projekt: ProjectRequest):
         "projekt_typ": projekt.projekt_typ.value,
         "leistungsphase": projekt.leistungsphase.value,
         "status": "erstellt",
-        "erstellt_am": datetime.now().isoformat()
+        "erstellt_am": _iso_now()
     }
 
 @router.post("/dokumente/upload/{projekt_id}")
@@ -77,20 +104,20 @@ async def upload_dokument(
     """
     Lädt ein TGA-Dokument hoch
     """
-    try:
-        # Validiere Gewerk
-        gewerk_enum = GewerkeType(gewerk)
-    except ValueError:
+    # Validiere Gewerk
+    if gewerk not in _GEWERK_VALUES:
         raise HTTPException(status_code=400, detail=f"Ungültiges Gewerk: {gewerk}")
+    gewerk_enum = GewerkeType(gewerk)
     
+    loop = asyncio.get_running_loop()
+
     # Erstelle Upload-Verzeichnis falls nicht vorhanden
     upload_dir = f"uploads/{projekt_id}"
-    os.makedirs(upload_dir, exist_ok=True)
+    await loop.run_in_executor(None, lambda: os.makedirs(upload_dir, exist_ok=True))
     
-    # Speichere Datei
+    # Speichere Datei außerhalb des Event-Loops
     file_path = os.path.join(upload_dir, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await schreibe_upload(file, file_path)
     
     # Erstelle Document-Objekt
     dokument = Document(
@@ -125,17 +152,23 @@ async def starte_pruefung(
         # Erstelle Dokument-Objekte
         dokumente = []
         upload_dir = f"uploads/{projekt_id}"
+        jetzt = datetime.now()
+        ids = _uuid_batch(len(request.dokumente) + 1)
+        auftrag_uuid = ids.pop()
         
-        for doc_info in request.dokumente:
+        # Ein Verzeichnis-Scan statt eines stat-Aufrufs pro Dokument
+        vorhandene_dateien = await asyncio.to_thread(_list_upload_dir, upload_dir)
+        
+        for doc_info, dokument_id in zip(request.dokumente, ids):
             file_path = os.path.join(upload_dir, doc_info.filename)
-            if not os.path.exists(file_path):
+            if doc_info.filename not in vorhandene_dateien:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"Datei nicht gefunden: {doc_info.filename}"
                 )
             
             dokument = Document(
-                id=str(uuid.uuid4()),
+                id=dokument_id,
                 filename=doc_info.filename,
                 file_path=file_path,
                 document_type=doc_info.document_type,
@@ -143,18 +176,18 @@ async def starte_pruefung(
                 leistungsphase=request.projekt.leistungsphase,
                 plan_nummer=doc_info.plan_nummer,
                 revision=doc_info.revision,
-                erstellt_am=datetime.now()
+                erstellt_am=jetzt
             )
             dokumente.append(dokument)
         
         # Erstelle Prüfauftrag
         auftrag = PruefAuftrag(
-            id=str(uuid.uuid4()),
+            id=auftrag_uuid,
             projekt_name=request.projekt.projekt_name,
             projekt_typ=request.projekt.projekt_typ,
             leistungsphase=request.projekt.leistungsphase,
             dokumente=dokumente,
-            erstellt_am=datetime.now()
+            erstellt_am=jetzt
         )
         
         # Starte Prüfung asynchron
@@ -168,10 +201,12 @@ async def starte_pruefung(
             "geschaetzte_dauer": "5-15 Minuten"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/pruefung/status/{auftrag_id}")
+@router.get("/pruefung/status/{auftrag_id}", response_model=None)
 async def get_pruefung_status(auftrag_id: str):
     """
     Gibt den Status einer laufenden Prüfung zurück
@@ -181,9 +216,10 @@ async def get_pruefung_status(auftrag_id: str):
     if "error" in status:
         raise HTTPException(status_code=404, detail=status["error"])
     
-    return status
+    # Daten stammen bereits validiert aus dem Coordinator
+    return ORJSONResponse(status)
 
-@router.get("/pruefung/ergebnisse/{auftrag_id}")
+@router.get("/pruefung/ergebnisse/{auftrag_id}", response_model=None)
 async def get_pruefung_ergebnisse(auftrag_id: str):
     """
     Gibt die Prüfergebnisse zurück
@@ -196,110 +232,136 @@ async def get_pruefung_ergebnisse(auftrag_id: str):
         if "error" in status:
             raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
         
-        return {
+        return ORJSONResponse({
             "auftrag_id": auftrag_id,
             "status": status["status"],
             "befunde": [],
             "message": "Prüfung noch nicht abgeschlossen oder keine Befunde gefunden"
-        }
+        })
     
-    return {
+    return ORJSONResponse({
         "auftrag_id": auftrag_id,
         "anzahl_befunde": len(ergebnisse),
         "befunde": ergebnisse
-    }
+    })
+
+_GEWERK_BESCHREIBUNGEN: Dict[GewerkeType, str] = {
+    GewerkeType.KG410_SANITAER: "Abwasser-, Wasser- und Gasanlagen",
+    GewerkeType.KG420_HEIZUNG: "Wärmeversorgungsanlagen",
+    GewerkeType.KG430_LUEFTUNG: "Raumlufttechnische Anlagen",
+    GewerkeType.KG440_ELEKTRO: "Elektrische Anlagen",
+    GewerkeType.KG450_KOMMUNIKATION: "Kommunikations- und sicherheitstechnische Anlagen",
+    GewerkeType.KG474_FEUERLOESCHUNG: "Feuerlöschanlagen",
+    GewerkeType.KG480_AUTOMATION: "Gebäudeautomation"
+}
+
+_PROJEKT_TYP_BESCHREIBUNGEN: Dict[ProjectType, str] = {
+    ProjectType.RESIDENTIAL: "Wohngebäude und Wohnanlagen",
+    ProjectType.OFFICE: "Bürogebäude und Verwaltungsbauten",
+    ProjectType.INDUSTRIAL: "Industriebauten und Produktionsstätten",
+    ProjectType.HOSPITAL: "Krankenhäuser und Gesundheitseinrichtungen",
+    ProjectType.SCHOOL: "Schulen und Bildungseinrichtungen",
+    ProjectType.MIXED_USE: "Mischnutzung und Sonderbauten"
+}
+
+_LEISTUNGSPHASE_BESCHREIBUNGEN: Dict[LeistungsPhase, str] = {
+    LeistungsPhase.LP1: "Grundlagenermittlung (2%)",
+    LeistungsPhase.LP2: "Vorplanung (9%)",
+    LeistungsPhase.LP3: "Entwurfsplanung (15%)",
+    LeistungsPhase.LP4: "Genehmigungsplanung (3%)",
+    LeistungsPhase.LP5: "Ausführungsplanung (25%)",
+    LeistungsPhase.LP6: "Vorbereitung der Vergabe (10%)",
+    LeistungsPhase.LP7: "Mitwirken bei der Vergabe (4%)",
+    LeistungsPhase.LP8: "Objektüberwachung (32%)",
+    LeistungsPhase.LP9: "Objektbetreuung und Dokumentation (2%)"
+}
+
+
+def _enum_katalog(enum_cls, beschreibungen: Dict) -> List[Dict[str, str]]:
+    """Baut die Katalogeinträge (Code, Name, Beschreibung) für ein Enum"""
+    return [
+        {
+            "code": member.value,
+            "name": member.name,
+            "beschreibung": beschreibungen.get(member, "")
+        }
+        for member in enum_cls
+    ]
+
+
+# Die Kataloge sind statisch und werden einmalig beim Import aufgebaut
+_GEWERKE_RESPONSE = {"gewerke": _enum_katalog(GewerkeType, _GEWERK_BESCHREIBUNGEN)}
+_PROJEKT_TYPEN_RESPONSE = {"projekt_typen": _enum_katalog(ProjectType, _PROJEKT_TYP_BESCHREIBUNGEN)}
+_LEISTUNGSPHASEN_RESPONSE = {
+    "leistungsphasen": _enum_katalog(LeistungsPhase, _LEISTUNGSPHASE_BESCHREIBUNGEN)
+}
 
 @router.get("/gewerke")
 async def get_verfuegbare_gewerke():
     """
     Gibt alle verfügbaren TGA-Gewerke zurück
     """
-    return {
-        "gewerke": [
-            {
-                "code": gewerk.value,
-                "name": gewerk.name,
-                "beschreibung": _get_gewerk_beschreibung(gewerk)
-            }
-            for gewerk in GewerkeType
-        ]
-    }
+    return _GEWERKE_RESPONSE
 
 @router.get("/projekt-typen")
 async def get_projekt_typen():
     """
     Gibt alle verfügbaren Projekttypen zurück
     """
-    return {
-        "projekt_typen": [
-            {
-                "code": typ.value,
-                "name": typ.name,
-                "beschreibung": _get_projekt_typ_beschreibung(typ)
-            }
-            for typ in ProjectType
-        ]
-    }
+    return _PROJEKT_TYPEN_RESPONSE
 
 @router.get("/leistungsphasen")
 async def get_leistungsphasen():
     """
     Gibt alle HOAI-Leistungsphasen zurück
     """
-    return {
-        "leistungsphasen": [
-            {
-                "code": phase.value,
-                "name": phase.name,
-                "beschreibung": _get_leistungsphase_beschreibung(phase)
-            }
-            for phase in LeistungsPhase
-        ]
-    }
+    return _LEISTUNGSPHASEN_RESPONSE
 
-def _get_gewerk_beschreibung(gewerk: GewerkeType) -> str:
-    """Gibt eine Beschreibung für ein Gewerk zurück"""
-    beschreibungen = {
-        GewerkeType.KG410_SANITAER: "Abwasser-, Wasser- und Gasanlagen",
-        GewerkeType.KG420_HEIZUNG: "Wärmeversorgungsanlagen",
-        GewerkeType.KG430_LUEFTUNG: "Raumlufttechnische Anlagen",
-        GewerkeType.KG440_ELEKTRO: "Elektrische Anlagen",
-        GewerkeType.KG450_KOMMUNIKATION: "Kommunikations- und sicherheitstechnische Anlagen",
-        GewerkeType.KG474_FEUERLOESCHUNG: "Feuerlöschanlagen",
-        GewerkeType.KG480_AUTOMATION: "Gebäudeautomation"
-    }
-    return beschreibungen.get(gewerk, "")
-
-def _get_projekt_typ_beschreibung(typ: ProjectType) -> str:
-    """Gibt eine Beschreibung für einen Projekttyp zurück"""
-    beschreibungen = {
-        ProjectType.RESIDENTIAL: "Wohngebäude und Wohnanlagen",
-        ProjectType.OFFICE: "Bürogebäude und Verwaltungsbauten",
-        ProjectType.INDUSTRIAL: "Industriebauten und Produktionsstätten",
-        ProjectType.HOSPITAL: "Krankenhäuser und Gesundheitseinrichtungen",
-        ProjectType.SCHOOL: "Schulen und Bildungseinrichtungen",
-        ProjectType.MIXED_USE: "Mischnutzung und Sonderbauten"
-    }
-    return beschreibungen.get(typ, "")
-
-def _get_leistungsphase_beschreibung(phase: LeistungsPhase) -> str:
-    """Gibt eine Beschreibung für eine Leistungsphase zurück"""
-    beschreibungen = {
-        LeistungsPhase.LP1: "Grundlagenermittlung (2%)",
-        LeistungsPhase.LP2: "Vorplanung (9%)",
-        LeistungsPhase.LP3: "Entwurfsplanung (15%)",
-        LeistungsPhase.LP4: "Genehmigungsplanung (3%)",
-        LeistungsPhase.LP5: "Ausführungsplanung (25%)",
-        LeistungsPhase.LP6: "Vorbereitung der Vergabe (10%)",
-        LeistungsPhase.LP7: "Mitwirken bei der Vergabe (4%)",
-        LeistungsPhase.LP8: "Objektüberwachung (32%)",
-        LeistungsPhase.LP9: "Objektbetreuung und Dokumentation (2%)"
-    }
-    return beschreibungen.get(phase, "")
 
 
+# Laufende PDF-Erzeugungen je Auftrag; parallele Anfragen warten auf denselben Task
+_bericht_builds: Dict[str, asyncio.Task] = {}
 
-@router.get("/pruefung/bericht/{auftrag_id}")
+
+def _erzeuge_bericht_in_eigener_session(auftrag_id: str):
+    # Eigene Session: die Request-Session schließt get_db, sobald die erste Anfrage endet
+    from services.bericht_service import BerichtService
+
+    db = SessionLocal()
+    try:
+        return BerichtService(db).erzeuge_pruefbericht(auftrag_id)
+    finally:
+        db.close()
+
+
+async def _erzeuge_bericht_einmalig(auftrag_id: str):
+    """Erzeugt einen Bericht höchstens einmal gleichzeitig pro Auftrag"""
+    task = _bericht_builds.get(auftrag_id)
+    if task is None:
+        # ReportLab ist CPU-lastig und läuft daher im Thread-Pool
+        task = asyncio.create_task(
+            asyncio.to_thread(_erzeuge_bericht_in_eigener_session, auftrag_id)
+        )
+        _bericht_builds[auftrag_id] = task
+        task.add_done_callback(lambda _: _bericht_builds.pop(auftrag_id, None))
+
+    # shield: Abbruch einer wartenden Anfrage bricht die Erzeugung nicht ab
+    return await asyncio.shield(task)
+
+
+async def _pdf_response(pfad: str, auftrag_id: str) -> FileResponse:
+    """Liefert einen Bericht aus; stat läuft im Thread-Pool und wird an Starlette übergeben"""
+    stat_result = await asyncio.to_thread(os.stat, pfad)
+    return FileResponse(
+        pfad,
+        media_type="application/pdf",
+        filename=f"pruefbericht_{auftrag_id}.pdf",
+        stat_result=stat_result,
+        headers={"Cache-Control": "private, max-age=3600"}
+    )
+
+
+@router.get("/pruefung/bericht/{auftrag_id}", response_model=None)
 async def generiere_pruefbericht(
     auftrag_id: str,
     download: bool = False,
@@ -307,42 +369,47 @@ async def generiere_pruefbericht(
 ):
     """Gibt Berichtsdaten zurück und bietet optional einen PDF-Download an."""
     try:
-        status = tga_coordinator.get_status(auftrag_id)
-        if "error" in status:
-            raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
-
-        ergebnisse = tga_coordinator.get_ergebnisse(auftrag_id) or []
-
         if download:
             from services.bericht_service import BerichtService
 
             bericht_service = BerichtService(db)
 
-            existing_path = bericht_service.hole_bericht_pfad(auftrag_id)
+            # Bereits erzeugte Berichte ohne Coordinator-Abfragen ausliefern
+            existing_path = await asyncio.to_thread(bericht_service.hole_bericht_pfad, auftrag_id)
             if existing_path:
-                return FileResponse(
-                    existing_path,
-                    media_type="application/pdf",
-                    filename=f"pruefbericht_{auftrag_id}.pdf"
-                )
+                return await _pdf_response(existing_path, auftrag_id)
+
+            if "error" in tga_coordinator.get_status(auftrag_id):
+                raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
 
-            bericht_path = bericht_service.generiere_pruefbericht(auftrag_id)
-            if not bericht_path:
+            bericht = await _erzeuge_bericht_einmalig(auftrag_id)
+            if not bericht:
                 raise HTTPException(
                     status_code=404,
                     detail="Prüfauftrag nicht gefunden oder Bericht konnte nicht erstellt werden"
                 )
 
-            return FileResponse(
-                bericht_path,
+            # Frisch erzeugte Berichte direkt aus dem Speicher ausliefern
+            _, pdf_bytes = bericht
+            return Response(
+                pdf_bytes,
                 media_type="application/pdf",
-                filename=f"pruefbericht_{auftrag_id}.pdf"
+                headers={
+                    "Content-Disposition": f'attachment; filename="pruefbericht_{auftrag_id}.pdf"',
+                    "Cache-Control": "private, max-age=3600"
+                }
             )
 
+        status = tga_coordinator.get_status(auftrag_id)
+        if "error" in status:
+            raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
+
+        ergebnisse = tga_coordinator.get_ergebnisse(auftrag_id) or []
+
         bericht_data = {
             "auftrag_id": auftrag_id,
             "projekt_name": status.get("projekt_name"),
-            "erstellt_am": datetime.now().isoformat(),
+            "erstellt_am": _iso_now(),
             "zusammenfassung": {
                 "anzahl_dokumente": status.get("anzahl_dokumente"),
                 "anzahl_befunde": status.get("anzahl_befunde"),
@@ -357,7 +424,7 @@ async def generiere_pruefbericht(
                 "Prüfung noch nicht abgeschlossen oder keine Befunde gefunden"
             )
 
-        return bericht_data
+        return ORJSONResponse(bericht_data)
 
     except HTTPException:
         raise
@@ -1,7 +1,8 @@
-
 from fastapi import APIRouter, UploadFile, File
+import asyncio
 import os
-import shutil
+
+from services.upload_writer import schreibe_upload
 
 router = APIRouter()
 
@@ -9,8 +10,9 @@ UPLOAD_DIR = "project_documents"
 
 @router.post("/upload")
 async def upload_document(file: UploadFile = File(...)):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, lambda: os.makedirs(UPLOAD_DIR, exist_ok=True))
     file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await schreibe_upload(file, file_path)
     # Ingestion-Trigger (Platzhalter)
     return {"message": f"{file.filename} erfolgreich hochgeladen und gespeichert."}
@@ -5,8 +5,15 @@ from __future__ import annotations
 import dataclasses
 import logging
 import re
+import sys
+import threading
 from typing import Dict, List
 
+try:  # pragma: no cover - optional dependency for SIMD prefiltering
+    import hyperscan
+except ImportError:  # pragma: no cover - default installation without hyperscan
+    hyperscan = None  # type: ignore[assignment]
+
 
 logger = logging.getLogger(__name__)
 
@@ -30,80 +37,136 @@ class SanitizationResult:
     def restore(self, text: str) -> str:
         """Reapplies stored replacements to restore the original content."""
 
-        restored = text
-        for placeholder, original in self.replacements.items():
-            restored = restored.replace(placeholder, original)
-        return restored
+        if not self.replacements:
+            return text
+
+        # Longer placeholders first so that PERSON_10 is not consumed as PERSON_1.
+        placeholders = sorted(self.replacements, key=len, reverse=True)
+        pattern = re.compile("|".join(map(re.escape, placeholders)))
+        return pattern.sub(lambda match: self.replacements[match.group(0)], text)
+
+
+# Reihenfolge entspricht der Priorität bei Treffern an derselben Position.
+_ENTITY_PATTERNS: List[tuple[str, re.Pattern[str]]] = [
+    ("PERSON", PERSON_PATTERN),
+    ("COMPANY", COMPANY_PATTERN),
+    ("LOCATION", LOCATION_PATTERN),
+    ("EMAIL", EMAIL_PATTERN),
+    ("PHONE", PHONE_PATTERN),
+]
+
+COMBINED_PATTERN = re.compile(
+    "|".join(f"(?P<{key}>{pattern.pattern})" for key, pattern in _ENTITY_PATTERNS)
+)
+CONTACT_PATTERN = re.compile(f"{EMAIL_PATTERN.pattern}|{PHONE_PATTERN.pattern}")
+
+
+def _decimal_digit_class() -> str:
+    """Character class with exactly the characters Python's ``\\d`` matches in str patterns."""
+
+    ranges: List[List[int]] = []
+    for codepoint in range(sys.maxunicode + 1):
+        if chr(codepoint).isdecimal():
+            if ranges and ranges[-1][1] == codepoint - 1:
+                ranges[-1][1] = codepoint
+            else:
+                ranges.append([codepoint, codepoint])
+    return "[" + "".join(f"{chr(start)}-{chr(end)}" for start, end in ranges) + "]"
+
+
+def _prefilter_expressions() -> List[str]:
+    """Returns substrings that every match of an entity pattern must contain.
+
+    Hyperscan's shorthand classes differ from Python's (e.g. ``\\s`` does not
+    cover \\x1c-\\x1f), so the prefilter only uses literal characters:
+    PERSON and LOCATION contain an uppercase letter followed by a lowercase one,
+    COMPANY ends in a legal-form suffix, EMAIL contains "@" and PHONE contains
+    two adjacent decimal digits.
+    """
+
+    return [
+        "[A-ZÄÖÜ][a-zäöüß]",
+        "GmbH|AG|KG|UG|mbH",
+        "@",
+        _decimal_digit_class() * 2,
+    ]
+
+
+def _build_prefilter():
+    """Compiles a hyperscan database that detects whether any entity may be present.
+
+    A hit only means the exact regex pass has to run; a miss is only reported if
+    none of the substrings from :func:`_prefilter_expressions` occurs.
+    """
+
+    if hyperscan is None:
+        return None
+
+    expressions = [expression.encode("utf-8") for expression in _prefilter_expressions()]
+    flags = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SINGLEMATCH
+    try:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=expressions,
+            ids=list(range(len(expressions))),
+            elements=len(expressions),
+            flags=[flags] * len(expressions),
+        )
+    except hyperscan.error as exc:  # pragma: no cover - depends on hyperscan build
+        logger.warning("Hyperscan-Vorfilter konnte nicht kompiliert werden: %s", exc)
+        return None
+    return database
+
+
+_PREFILTER = _build_prefilter()
+# Ein Scratch-Bereich pro Thread: hyperscan erlaubt keinen gleichzeitigen Scan mit demselben Scratch
+_SCRATCH = threading.local()
+
+
+def _stop_scan(*_args) -> bool:
+    return True
+
+
+def may_contain_entities(text: str) -> bool:
+    """Returns False only if no substring required by an entity pattern occurs in the text."""
+
+    if _PREFILTER is None:
+        return True
+
+    try:
+        data = text.encode("utf-8")
+    except UnicodeEncodeError:
+        return True
+
+    try:
+        scratch = getattr(_SCRATCH, "scratch", None)
+        if scratch is None:
+            scratch = _SCRATCH.scratch = hyperscan.Scratch(_PREFILTER)
+        _PREFILTER.scan(data, match_event_handler=_stop_scan, scratch=scratch)
+    except hyperscan.ScanTerminated:
+        return True
+    except hyperscan.error as exc:
+        # Im Zweifel läuft der vollständige Regex-Durchgang
+        logger.warning("Hyperscan-Vorfilter fehlgeschlagen: %s", exc)
+        return True
+    return False
 
 
 class TextSanitizer:
     """Sanitizes free-form text by removing personal or company references."""
 
-    def __init__(self) -> None:
-        self._patterns: List[tuple[str, re.Pattern[str]]] = [
-            ("PERSON", PERSON_PATTERN),
-            ("COMPANY", COMPANY_PATTERN),
-            ("LOCATION", LOCATION_PATTERN),
-        ]
-
     def sanitize(self, text: str) -> SanitizationResult:
         """Sanitizes a text body and returns the sanitized representation."""
 
+        if not may_contain_entities(text):
+            return SanitizationResult(sanitized_text=text, replacements={}, detected_entities=[])
+
         replacements: Dict[str, str] = {}
         detected_entities: List[str] = []
-        sanitized = text
-        counter: Dict[str, int] = {key: 1 for key, _ in self._patterns}
-
-        for key, pattern in self._patterns:
-            sanitized = self._substitute_pattern(
-                sanitized,
-                pattern,
-                key,
-                counter,
-                replacements,
-                detected_entities,
-            )
-
-        # Emails and phone numbers are handled separately to avoid overlaps.
-        sanitized = self._replace_with_placeholder(
-            sanitized,
-            EMAIL_PATTERN,
-            "EMAIL",
-            replacements,
-            detected_entities,
-        )
-        sanitized = self._replace_with_placeholder(
-            sanitized,
-            PHONE_PATTERN,
-            "PHONE",
-            replacements,
-            detected_entities,
-        )
-
-        compliance_ok = not (EMAIL_PATTERN.search(sanitized) or PHONE_PATTERN.search(sanitized))
-
-        if not compliance_ok:
-            logger.warning("Sanitizer konnte sensible Daten nicht vollständig entfernen.")
-
-        return SanitizationResult(
-            sanitized_text=sanitized,
-            replacements=replacements,
-            detected_entities=detected_entities,
-            compliance_ok=compliance_ok,
-        )
-
-    def _substitute_pattern(
-        self,
-        text: str,
-        pattern: re.Pattern[str],
-        key: str,
-        counter: Dict[str, int],
-        replacements: Dict[str, str],
-        detected_entities: List[str],
-    ) -> str:
-        """Replaces pattern occurrences with placeholders."""
+        counter: Dict[str, int] = {key: 1 for key, _ in _ENTITY_PATTERNS}
 
         def _replace(match: re.Match[str]) -> str:
+            key = match.lastgroup
             original = match.group(0)
             placeholder = f"{key}_{counter[key]}"
             counter[key] += 1
@@ -111,27 +174,17 @@ class TextSanitizer:
             detected_entities.append(f"{key}:{original}")
             return placeholder
 
-        return pattern.sub(_replace, text)
-
-    def _replace_with_placeholder(
-        self,
-        text: str,
-        pattern: re.Pattern[str],
-        key: str,
-        replacements: Dict[str, str],
-        detected_entities: List[str],
-    ) -> str:
-        """Utility to replace a pattern and record the replacements."""
+        # Ein einziger Durchlauf über den Text für alle Entitätstypen
+        sanitized = COMBINED_PATTERN.sub(_replace, text)
 
-        counter = 1
+        compliance_ok = CONTACT_PATTERN.search(sanitized) is None
 
-        def _replace(match: re.Match[str]) -> str:
-            nonlocal counter
-            original = match.group(0)
-            placeholder = f"{key}_{counter}"
-            counter += 1
-            replacements[placeholder] = original
-            detected_entities.append(f"{key}:{original}")
-            return placeholder
+        if not compliance_ok:
+            logger.warning("Sanitizer konnte sensible Daten nicht vollständig entfernen.")
 
-        return pattern.sub(_replace, text)
+        return SanitizationResult(
+            sanitized_text=sanitized,
+            replacements=replacements,
+            detected_entities=detected_entities,
+            compliance_ok=compliance_ok,
+        )
@@ -2,11 +2,15 @@
 Service für PDF-Berichtsgenerierung
 """
 
-from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Optional, Dict, Any, Tuple
+from collections import Counter, OrderedDict, defaultdict
 from datetime import datetime
 from pathlib import Path
+import io
 import logging
+import os
+import threading
 
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
@@ -19,8 +23,79 @@ from models import PruefAuftrag
 
 logger = logging.getLogger(__name__)
 
+_SAMPLE_STYLES = getSampleStyleSheet()
+
+# Prozesslokaler LRU-Cache auftrag_id -> Berichtspfad (Service-Instanzen sind request-gebunden)
+_BERICHT_PFAD_CACHE_SIZE = 4096
+_bericht_pfad_cache: "OrderedDict[str, str]" = OrderedDict()
+_bericht_pfad_lock = threading.Lock()
+
+
+def _cache_bericht_pfad(auftrag_id: str, pfad: str) -> None:
+    with _bericht_pfad_lock:
+        _bericht_pfad_cache[auftrag_id] = pfad
+        _bericht_pfad_cache.move_to_end(auftrag_id)
+        if len(_bericht_pfad_cache) > _BERICHT_PFAD_CACHE_SIZE:
+            _bericht_pfad_cache.popitem(last=False)
+
+
+def _cached_bericht_pfad(auftrag_id: str) -> Optional[str]:
+    with _bericht_pfad_lock:
+        pfad = _bericht_pfad_cache.get(auftrag_id)
+        if pfad is not None:
+            _bericht_pfad_cache.move_to_end(auftrag_id)
+        return pfad
+
+
+def _invalidate_bericht_pfad(auftrag_id: str) -> None:
+    with _bericht_pfad_lock:
+        _bericht_pfad_cache.pop(auftrag_id, None)
+
+
 class BerichtService:
     """Service für die Generierung von TGA-Prüfberichten"""
+
+    # Styles werden einmalig beim Import erzeugt und von allen Berichten geteilt
+    _TITLE_STYLE = ParagraphStyle(
+        'CustomTitle',
+        parent=_SAMPLE_STYLES['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    _HEADING_STYLE = ParagraphStyle(
+        'CustomHeading',
+        parent=_SAMPLE_STYLES['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        spaceBefore=20
+    )
+
+    _PROJEKT_TABLESTYLE = TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
+
+    _STATS_TABLESTYLE = _PROJEKT_TABLESTYLE
+
+    _BEFUND_TABLESTYLE_BASE = TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ])
+
+    _PRIORITY_COLORS = {
+        'hoch': colors.red,
+        'mittel': colors.orange,
+        'niedrig': colors.yellow
+    }
     
     def __init__(self, db: Session):
         self.db = db
@@ -31,9 +106,19 @@ class BerichtService:
         """
         Generiert einen PDF-Prüfbericht für einen Auftrag
         """
+        ergebnis = self.erzeuge_pruefbericht(auftrag_id)
+        return ergebnis[0] if ergebnis else None
+    
+    def erzeuge_pruefbericht(self, auftrag_id: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Generiert einen PDF-Prüfbericht und gibt Pfad und PDF-Inhalt zurück
+        """
         try:
             # Hole Auftrag mit allen Daten
-            auftrag = self.db.query(PruefAuftrag).filter(
+            auftrag = self.db.query(PruefAuftrag).options(
+                joinedload(PruefAuftrag.projekt),
+                selectinload(PruefAuftrag.befunde)
+            ).filter(
                 PruefAuftrag.id == auftrag_id
             ).first()
             
@@ -42,23 +127,27 @@ class BerichtService:
                 return None
             
             # Erstelle PDF-Datei
-            filename = f"pruefbericht_{auftrag_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            erstellt_am = datetime.now()
+            filename = f"pruefbericht_{auftrag_id}_{erstellt_am.strftime('%Y%m%d_%H%M%S')}.pdf"
             filepath = self.reports_dir / filename
             
             # Generiere PDF
-            self._create_pdf_report(auftrag, str(filepath))
+            pdf_bytes = self._create_pdf_report(auftrag, str(filepath), erstellt_am)
             
             logger.info(f"Prüfbericht erstellt: {filepath}")
-            return str(filepath)
+            _cache_bericht_pfad(auftrag_id, str(filepath))
+            return str(filepath), pdf_bytes
             
         except Exception as e:
             logger.error(f"Fehler bei Berichtsgenerierung: {e}")
             return None
     
-    def _create_pdf_report(self, auftrag: PruefAuftrag, filepath: str):
-        """Erstellt das PDF-Dokument"""
+    def _create_pdf_report(self, auftrag: PruefAuftrag, filepath: str, erstellt_am: datetime) -> bytes:
+        """Erstellt das PDF-Dokument und gibt dessen Inhalt zurück"""
+        # ReportLab schreibt in einen Puffer; die Datei entsteht mit einem einzigen Write
+        buffer = io.BytesIO()
         doc = SimpleDocTemplate(
-            filepath,
+            buffer,
             pagesize=A4,
             rightMargin=2*cm,
             leftMargin=2*cm,
@@ -67,22 +156,9 @@ class BerichtService:
         )
         
         # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12,
-            spaceBefore=20
-        )
+        styles = _SAMPLE_STYLES
+        title_style = self._TITLE_STYLE
+        heading_style = self._HEADING_STYLE
         
         # Story (Inhalt)
         story = []
@@ -103,12 +179,7 @@ class BerichtService:
         ]
         
         projekt_table = Table(projekt_data, colWidths=[4*cm, 10*cm])
-        projekt_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        projekt_table.setStyle(self._PROJEKT_TABLESTYLE)
         
         story.append(projekt_table)
         story.append(Spacer(1, 20))
@@ -116,19 +187,16 @@ class BerichtService:
         # Prüfstatistiken
         story.append(Paragraph("Prüfstatistiken", heading_style))
         
-        # Befunde nach Priorität zählen
-        befunde_stats = {"hoch": 0, "mittel": 0, "niedrig": 0}
-        gewerk_stats = {}
-        kategorie_stats = {}
+        # Befunde in einem Durchlauf nach Priorität gruppieren und zählen
+        befunde_nach_prioritaet = defaultdict(list)
+        befunde_stats = Counter({"hoch": 0, "mittel": 0, "niedrig": 0})
+        gewerk_stats = Counter()
         
         for befund in auftrag.befunde:
-            befunde_stats[befund.prioritaet.value] += 1
-            
-            gewerk = befund.gewerk.value
-            gewerk_stats[gewerk] = gewerk_stats.get(gewerk, 0) + 1
-            
-            kategorie = befund.kategorie.value
-            kategorie_stats[kategorie] = kategorie_stats.get(kategorie, 0) + 1
+            prioritaet = befund.prioritaet.value
+            befunde_nach_prioritaet[prioritaet].append(befund)
+            befunde_stats[prioritaet] += 1
+            gewerk_stats[befund.gewerk.value] += 1
         
         stats_data = [
             ['Anzahl Dokumente:', str(auftrag.anzahl_dokumente)],
@@ -139,19 +207,14 @@ class BerichtService:
         ]
         
         stats_table = Table(stats_data, colWidths=[6*cm, 4*cm])
-        stats_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        stats_table.setStyle(self._STATS_TABLESTYLE)
         
         story.append(stats_table)
         story.append(Spacer(1, 20))
         
         # Befunde nach Priorität
         for prioritaet in ['hoch', 'mittel', 'niedrig']:
-            prioritaet_befunde = [b for b in auftrag.befunde if b.prioritaet.value == prioritaet]
+            prioritaet_befunde = befunde_nach_prioritaet[prioritaet]
             
             if prioritaet_befunde:
                 story.append(Paragraph(f"Befunde - Priorität {prioritaet.upper()}", heading_style))
@@ -164,23 +227,20 @@ class BerichtService:
         story.append(PageBreak())
         story.append(Paragraph("Zusammenfassung und Empfehlungen", heading_style))
         
-        zusammenfassung = self._create_zusammenfassung(auftrag, befunde_stats, gewerk_stats)
+        zusammenfassung = self._create_zusammenfassung(auftrag, befunde_stats, gewerk_stats, erstellt_am)
         story.append(Paragraph(zusammenfassung, styles['Normal']))
         
         # Generiere PDF
         doc.build(story)
+        pdf_bytes = buffer.getvalue()
+        Path(filepath).write_bytes(pdf_bytes)
+        return pdf_bytes
     
     def _create_befund_section(self, befund, nummer: int, styles) -> Table:
         """Erstellt eine Sektion für einen Befund"""
         
         # Prioritäts-Farbe
-        priority_colors = {
-            'hoch': colors.red,
-            'mittel': colors.orange,
-            'niedrig': colors.yellow
-        }
-        
-        priority_color = priority_colors.get(befund.prioritaet.value, colors.grey)
+        priority_color = self._PRIORITY_COLORS.get(befund.prioritaet.value, colors.grey)
         
         # Befund-Daten
         befund_data = [
@@ -205,22 +265,23 @@ class BerichtService:
         
         # Tabelle erstellen
         befund_table = Table(befund_data, colWidths=[3*cm, 11*cm])
-        befund_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        # Nur die Kopfzeile ist prioritätsabhängig, der Rest kommt aus dem Basis-Style
+        befund_table.setStyle(self._BEFUND_TABLESTYLE_BASE)
+        befund_table.setStyle([
             ('BACKGROUND', (0, 0), (1, 0), priority_color),
             ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (1, 0), 11),
-        ]))
+        ])
         
         return befund_table
     
-    def _create_zusammenfassung(self, auftrag: PruefAuftrag, befunde_stats: Dict, gewerk_stats: Dict) -> str:
+    def _create_zusammenfassung(
+        self,
+        auftrag: PruefAuftrag,
+        befunde_stats: Dict,
+        gewerk_stats: Dict,
+        erstellt_am: datetime
+    ) -> str:
         """Erstellt eine Zusammenfassung des Prüfberichts"""
         
         zusammenfassung = f"""
@@ -269,7 +330,7 @@ class BerichtService:
         3. Koordination zwischen den betroffenen Gewerken<br/>
         4. Erneute Prüfung nach Planungsanpassungen<br/>
         
-        Erstellt am: {datetime.now().strftime('%d.%m.%Y um %H:%M Uhr')}<br/>
+        Erstellt am: {erstellt_am.strftime('%d.%m.%Y um %H:%M Uhr')}<br/>
         System: OpenManus TGA-KI-Plattform v2.0
         """
         
@@ -279,12 +340,26 @@ class BerichtService:
         """
         Sucht nach einem existierenden Bericht für einen Auftrag
         """
-        # Suche nach Dateien mit dem Auftrag-ID-Pattern
-        pattern = f"pruefbericht_{auftrag_id}_*.pdf"
-        
-        for file_path in self.reports_dir.glob(pattern):
-            if file_path.exists():
-                return str(file_path)
+        cached = _cached_bericht_pfad(auftrag_id)
+        if cached is not None:
+            if os.path.isfile(cached):
+                return cached
+            # Datei wurde außerhalb des Services entfernt
+            _invalidate_bericht_pfad(auftrag_id)
+
+        # Präfixvergleich statt glob: kein fnmatch pro Eintrag, Verzeichnisse via d_type überspringen
+        prefix = f"pruefbericht_{auftrag_id}_"
+        
+        with os.scandir(self.reports_dir) as entries:
+            for entry in entries:
+                if (
+                    entry.name.startswith(prefix)
+                    and entry.name.endswith(".pdf")
+                    and entry.is_file()
+                ):
+                    pfad = str(self.reports_dir / entry.name)
+                    _cache_bericht_pfad(auftrag_id, pfad)
+                    return pfad
         
         return None
     
@@ -293,6 +368,7 @@ class BerichtService:
         Löscht einen Bericht für einen Auftrag
         """
         bericht_pfad = self.hole_bericht_pfad(auftrag_id)
+        _invalidate_bericht_pfad(auftrag_id)
         
         if bericht_pfad:
             try:
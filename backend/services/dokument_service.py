@@ -2,34 +2,136 @@
 Service layer for document management
 """
 
+import hashlib
 import os
+import re
 import shutil
-from pathlib import Path
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+import time
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session, selectinload
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
 import logging
 
-from backend.models import Dokument, DokumentMetadata, GewerkeTypeEnum
-from backend.agent_core.document_parser import DocumentParser
-from backend.services.knowledge_service import KnowledgeBuilder
+import aiofiles
+
+from backend.database import SessionLocal
+from backend.models import Befund, Dokument, DokumentMetadata, GewerkeTypeEnum, KnowledgeChunk
+from backend.agent_core.document_parser import DocumentParser, get_parser
+from backend.services.knowledge_service import EMBEDDING_STATUS_PENDING, KnowledgeBuilder
 
 logger = logging.getLogger(__name__)
 
+DOKUMENT_STATUS_PENDING_INDEX = "pending_index"
+DOKUMENT_STATUS_INDEXED = "indexed"
+DOKUMENT_STATUS_INDEX_FAILED = "index_failed"
+
+# Bekannte Dateiendungen und ihre MIME-Types
+_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.dwg': 'application/acad',
+    '.dxf': 'application/dxf',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.txt': 'text/plain'
+}
+
+_B36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+# Alles außer Buchstaben, Ziffern und ".-_" wird aus Dateinamen entfernt
+_UNSAFE_CHARS = re.compile(r"[^\w.-]")
+
+def _base36(value: int) -> str:
+    """
+    Kodiert eine nicht-negative Ganzzahl zur Basis 36
+    """
+    ziffern = []
+    while True:
+        value, rest = divmod(value, 36)
+        ziffern.append(_B36[rest])
+        if not value:
+            return "".join(reversed(ziffern))
+
+
+# Obergrenze für einen einzelnen Schreibblock beim Speichern von Uploads
+MAX_WRITE_BLOCK_SIZE = 1024 * 1024
+
+# Upload-Verzeichnis wird einmal beim Import angelegt
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def _write_block_size(directory: str) -> int:
+    """
+    Größtes Vielfaches von st_blksize, das MAX_WRITE_BLOCK_SIZE nicht überschreitet
+    """
+    try:
+        fs_block = os.stat(directory).st_blksize or 4096
+    except (OSError, AttributeError):
+        fs_block = 4096
+    return max(fs_block, MAX_WRITE_BLOCK_SIZE // fs_block * fs_block)
+
+
+WRITE_BLOCK_SIZE = _write_block_size(UPLOAD_DIR)
+
+# Spalten, die beim Übernehmen von Chunks eines identischen Dokuments kopiert werden
+_KOPIERTE_CHUNK_SPALTEN = tuple(
+    column for column in KnowledgeChunk.__table__.columns
+    if column.name not in ("id", "dokument_id", "created_at", "updated_at")
+)
+
+# Begrenzter Worker-Pool für die Indexierung hochgeladener Dokumente
+_index_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dokument-index")
+
+
+def _indexiere_in_eigener_session(dokument_id: str) -> None:
+    db = SessionLocal()
+    try:
+        DokumentService(db).indexiere_dokument(dokument_id)
+    except Exception:
+        logger.exception(f"Indexierungs-Job fehlgeschlagen: {dokument_id}")
+    finally:
+        db.close()
+
+
+def enqueue_index_job(dokument_id: str) -> Future:
+    """
+    Plant die Indexierung eines Dokuments im Hintergrund ein
+    """
+    return _index_executor.submit(_indexiere_in_eigener_session, dokument_id)
+
+
+def _vektorisiere_in_eigener_session(dokument_id: str) -> None:
+    db = SessionLocal()
+    try:
+        KnowledgeBuilder(db).embed_pending_chunks(dokument_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception(f"Vektorisierungs-Job fehlgeschlagen: {dokument_id}")
+    finally:
+        db.close()
+
+
+def enqueue_embedding_job(dokument_id: str) -> Future:
+    """
+    Plant die Vektorisierung bereits gespeicherter Knowledge-Chunks im Hintergrund ein
+    """
+    return _index_executor.submit(_vektorisiere_in_eigener_session, dokument_id)
+
+
 class DokumentService:
     """Service for document operations"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, parser: Optional[DocumentParser] = None):
         self.db = db
-        self.parser = DocumentParser()
-        self.upload_dir = Path("uploads")
-        self.upload_dir.mkdir(exist_ok=True)
+        self.parser = parser or get_parser()
         self.knowledge_builder = KnowledgeBuilder(db)
     
-    def speichere_dokument(
+    async def speichere_dokument(
         self,
         projekt_id: str,
-        file_content: bytes,
+        file_obj: BinaryIO,
         filename: str,
         document_type: str,
         gewerk: str,
@@ -45,58 +147,154 @@ class DokumentService:
             
             # Erstelle sicheren Dateinamen
             safe_filename = self._create_safe_filename(filename)
-            file_path = self.upload_dir / safe_filename
+            file_path = os.path.join(UPLOAD_DIR, safe_filename)
             
-            # Speichere Datei
-            with open(file_path, "wb") as f:
-                f.write(file_content)
+            # Speichere Datei blockweise, Hash und Größe im selben Durchlauf
+            file_size, content_sha256 = await self._schreibe_datei(file_path, file_obj)
             
             # Erstelle Dokument-Eintrag
             dokument = Dokument(
                 filename=filename,
-                file_path=str(file_path),
+                file_path=file_path,
                 document_type=document_type,
                 gewerk=gewerk_enum,
                 plan_nummer=plan_nummer,
                 revision=revision,
-                file_size=len(file_content),
+                file_size=file_size,
                 mime_type=self._get_mime_type(filename),
-                projekt_id=projekt_id
+                projekt_id=projekt_id,
+                status=DOKUMENT_STATUS_PENDING_INDEX,
+                content_sha256=content_sha256
             )
             
             self.db.add(dokument)
-            self.db.flush()  # Flush to get ID
             
-            # Extrahiere Metadaten asynchron
-            metadaten = self._extrahiere_metadaten(dokument)
-            if metadaten:
-                self.db.add(metadaten)
-
-            # Knowledge-Chunks vorbereiten, bevor der Commit erfolgt
-            knowledge_chunks = self.knowledge_builder.build_chunks(dokument, metadaten)
-            if knowledge_chunks:
-                self.knowledge_builder.persist_chunks(knowledge_chunks)
-
+            # Identischer Inhalt wurde im Projekt bereits indexiert: Ergebnis übernehmen
+            duplikat = self._finde_indexiertes_duplikat(projekt_id, content_sha256)
+            offene_vektoren = False
+            if duplikat:
+                self.db.flush()
+                offene_vektoren = self._uebernehme_index(duplikat, dokument)
+                dokument.status = DOKUMENT_STATUS_INDEXED
+            
             self.db.commit()
             self.db.refresh(dokument)
             
             logger.info(f"Dokument gespeichert: {dokument.id} - {filename}")
+            
+            if duplikat:
+                logger.info(f"Index von identischem Dokument {duplikat.id} übernommen")
+                if offene_vektoren:
+                    enqueue_embedding_job(dokument.id)
+            else:
+                # Metadaten-Extraktion und Knowledge-Building laufen außerhalb des Requests
+                enqueue_index_job(dokument.id)
             return dokument
             
         except ValueError as e:
             logger.error(f"Ungültiger Gewerk-Typ: {e}")
             # Lösche Datei falls erstellt
-            if 'file_path' in locals() and file_path.exists():
-                file_path.unlink()
+            if 'file_path' in locals() and os.path.exists(file_path):
+                os.unlink(file_path)
             raise ValueError(f"Ungültiger Gewerk-Typ: {e}")
         except Exception as e:
             logger.error(f"Fehler beim Speichern des Dokuments: {e}")
             self.db.rollback()
             # Lösche Datei falls erstellt
-            if 'file_path' in locals() and file_path.exists():
-                file_path.unlink()
+            if 'file_path' in locals() and os.path.exists(file_path):
+                os.unlink(file_path)
             raise
     
+    def _finde_indexiertes_duplikat(self, projekt_id: str, content_sha256: str) -> Optional[Dokument]:
+        """
+        Sucht ein bereits indexiertes Dokument mit identischem Inhalt im Projekt
+        """
+        return self.db.query(Dokument).options(
+            selectinload(Dokument.metadaten)
+        ).filter(
+            Dokument.projekt_id == projekt_id,
+            Dokument.content_sha256 == content_sha256,
+            Dokument.status == DOKUMENT_STATUS_INDEXED
+        ).first()
+    
+    def _uebernehme_index(self, quelle: Dokument, ziel: Dokument) -> bool:
+        """
+        Kopiert Metadaten und Knowledge-Chunks eines identischen Dokuments
+
+        Gibt zurück, ob kopierte Chunks noch auf ihre Vektorisierung warten.
+        """
+        if quelle.metadaten:
+            self.db.add(DokumentMetadata(
+                dokument_id=ziel.id,
+                extrahierter_text=quelle.metadaten.extrahierter_text,
+                tabellen_daten=quelle.metadaten.tabellen_daten,
+                plan_metadaten=quelle.metadaten.plan_metadaten,
+                heizlast_daten=quelle.metadaten.heizlast_daten,
+                luftmengen_daten=quelle.metadaten.luftmengen_daten
+            ))
+        
+        chunk_rows = self.db.execute(
+            select(*_KOPIERTE_CHUNK_SPALTEN).where(KnowledgeChunk.dokument_id == quelle.id)
+        ).mappings().all()
+        if chunk_rows:
+            self.db.execute(
+                insert(KnowledgeChunk),
+                [{**row, "dokument_id": ziel.id} for row in chunk_rows]
+            )
+        return any(row["embedding_status"] == EMBEDDING_STATUS_PENDING for row in chunk_rows)
+    
+    async def _schreibe_datei(self, file_path: str, file_obj: BinaryIO) -> Tuple[int, str]:
+        """
+        Streamt den Upload blockweise auf die Festplatte und liefert Größe und SHA-256
+        """
+        block_size = WRITE_BLOCK_SIZE
+        sha256 = hashlib.sha256()
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as f:
+            while True:
+                block = file_obj.read(block_size)
+                if not block:
+                    break
+                sha256.update(block)
+                file_size += len(block)
+                await f.write(block)
+        return file_size, sha256.hexdigest()
+    
+    def indexiere_dokument(self, dokument_id: str) -> bool:
+        """
+        Extrahiert Metadaten und erzeugt Knowledge-Chunks für ein gespeichertes Dokument
+        """
+        dokument = self.hole_dokument(dokument_id)
+        if not dokument:
+            logger.warning(f"Dokument für Indexierung nicht gefunden: {dokument_id}")
+            return False
+        
+        try:
+            metadaten = self._extrahiere_metadaten(dokument)
+            if metadaten:
+                self.db.add(metadaten)
+            
+            # Chunks sind sofort per Textsuche auffindbar, Embeddings folgen im Hintergrund
+            knowledge_chunks = self.knowledge_builder.build_chunks(dokument, metadaten, embed=False)
+            if knowledge_chunks:
+                self.knowledge_builder.persist_chunks(knowledge_chunks)
+            
+            dokument.status = DOKUMENT_STATUS_INDEXED
+            self.db.commit()
+            
+            logger.info(f"Dokument indexiert: {dokument_id}")
+            
+        except Exception as e:
+            logger.error(f"Fehler bei der Indexierung von {dokument_id}: {e}")
+            self.db.rollback()
+            dokument.status = DOKUMENT_STATUS_INDEX_FAILED
+            self.db.commit()
+            return False
+        
+        if knowledge_chunks:
+            enqueue_embedding_job(dokument_id)
+        return True
+    
     def hole_dokument(self, dokument_id: str) -> Optional[Dokument]:
         """
         Holt ein Dokument anhand der ID
@@ -107,14 +305,18 @@ class DokumentService:
         """
         Holt alle Dokumente eines Projekts
         """
-        return self.db.query(Dokument).filter(Dokument.projekt_id == projekt_id).all()
+        return self.db.query(Dokument).options(
+            selectinload(Dokument.metadaten)
+        ).filter(Dokument.projekt_id == projekt_id).all()
     
     def hole_dokumente_nach_gewerk(self, projekt_id: str, gewerk: str) -> List[Dokument]:
         """
         Holt Dokumente eines Projekts nach Gewerk
         """
         gewerk_enum = GewerkeTypeEnum(gewerk)
-        return self.db.query(Dokument).filter(
+        return self.db.query(Dokument).options(
+            selectinload(Dokument.metadaten)
+        ).filter(
             Dokument.projekt_id == projekt_id,
             Dokument.gewerk == gewerk_enum
         ).all()
@@ -123,20 +325,26 @@ class DokumentService:
         """
         Löscht ein Dokument (Datei und DB-Eintrag)
         """
-        dokument = self.hole_dokument(dokument_id)
-        if not dokument:
-            return False
-        
         try:
-            # Lösche Datei
-            file_path = Path(dokument.file_path)
-            if file_path.exists():
-                file_path.unlink()
-            
-            # Lösche DB-Eintrag
-            self.db.delete(dokument)
+            # Abhängige Zeilen explizit behandeln: Tabellen aus älteren Versionen haben
+            # kein ON DELETE CASCADE/SET NULL, SQLite prüft die Foreign Keys aber (PRAGMA)
+            self.db.execute(delete(DokumentMetadata).where(DokumentMetadata.dokument_id == dokument_id))
+            self.db.execute(delete(KnowledgeChunk).where(KnowledgeChunk.dokument_id == dokument_id))
+            self.db.execute(update(Befund).where(Befund.dokument_id == dokument_id).values(dokument_id=None))
+
+            # Ein DELETE liefert zugleich den Dateipfad
+            row = self.db.execute(
+                delete(Dokument).where(Dokument.id == dokument_id).returning(Dokument.file_path)
+            ).first()
+            if row is None:
+                self.db.rollback()
+                return False
             self.db.commit()
             
+            # Lösche Datei
+            if os.path.exists(row.file_path):
+                os.unlink(row.file_path)
+            
             logger.info(f"Dokument gelöscht: {dokument_id}")
             return True
             
@@ -162,29 +370,23 @@ class DokumentService:
                 logger.warning(f"Cannot parse document: {dokument.filename}")
                 return None
             
-            # Extrahiere Text
-            text = self.parser.extract_text(dokument.file_path)
-            
-            # Extrahiere Tabellen
-            tabellen = self.parser.extract_tables(dokument.file_path)
-            
-            # Extrahiere Plan-Metadaten
-            plan_metadaten = self.parser.extract_metadata(dokument.file_path)
+            # Dokument nur einmal öffnen und parsen
+            parsed = self.parser.parse_once(dokument.file_path)
             
             # Gewerk-spezifische Extraktion
             heizlast_daten = None
             luftmengen_daten = None
             
             if dokument.gewerk == GewerkeTypeEnum.KG420_HEIZUNG:
-                heizlast_daten = self.parser.find_heizlast_data(dokument.file_path)
+                heizlast_daten = self.parser.find_heizlast_data(parsed)
             elif dokument.gewerk == GewerkeTypeEnum.KG430_LUEFTUNG:
-                luftmengen_daten = self.parser.find_luftmengen_data(dokument.file_path)
+                luftmengen_daten = self.parser.find_luftmengen_data(parsed)
             
             metadaten = DokumentMetadata(
                 dokument_id=dokument.id,
-                extrahierter_text=text,
-                tabellen_daten=tabellen,
-                plan_metadaten=plan_metadaten,
+                extrahierter_text=parsed.text,
+                tabellen_daten=parsed.tables,
+                plan_metadaten=parsed.metadata,
                 heizlast_daten=heizlast_daten,
                 luftmengen_daten=luftmengen_daten
             )
@@ -201,58 +403,55 @@ class DokumentService:
         Erstellt einen sicheren Dateinamen
         """
         # Entferne gefährliche Zeichen
-        safe_name = "".join(c for c in filename if c.isalnum() or c in ".-_")
+        safe_name = _UNSAFE_CHARS.sub("", filename)
         
         # Füge Timestamp hinzu um Kollisionen zu vermeiden
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         name, ext = os.path.splitext(safe_name)
         
-        return f"{timestamp}_{name}{ext}"
+        return f"{_base36(time.time_ns())}_{name}{ext}"
     
     def _get_mime_type(self, filename: str) -> str:
         """
         Bestimmt MIME-Type basierend auf Dateiendung
         """
-        ext = Path(filename).suffix.lower()
-        mime_types = {
-            '.pdf': 'application/pdf',
-            '.dwg': 'application/acad',
-            '.dxf': 'application/dxf',
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.txt': 'text/plain'
-        }
-        return mime_types.get(ext, 'application/octet-stream')
+        return _MIME_TYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
     
     def hole_dokument_statistiken(self, projekt_id: str) -> Dict[str, Any]:
         """
         Holt Statistiken für Dokumente eines Projekts
         """
-        dokumente = self.hole_projekt_dokumente(projekt_id)
+        # Aggregation in der Datenbank statt Laden aller Dokument-Zeilen
+        gruppen = self.db.query(
+            Dokument.gewerk,
+            Dokument.document_type,
+            func.count(Dokument.id),
+            func.sum(Dokument.file_size)
+        ).filter(
+            Dokument.projekt_id == projekt_id
+        ).group_by(
+            Dokument.gewerk,
+            Dokument.document_type
+        ).all()
         
         gewerk_counts = {}
         type_counts = {}
+        anzahl = 0
         total_size = 0
         
-        for dok in dokumente:
-            # Gewerk-Statistiken
-            gewerk_key = dok.gewerk.value
-            gewerk_counts[gewerk_key] = gewerk_counts.get(gewerk_key, 0) + 1
-            
-            # Typ-Statistiken
-            type_counts[dok.document_type] = type_counts.get(dok.document_type, 0) + 1
-            
-            # Größe
-            total_size += dok.file_size or 0
+        for gewerk, document_type, count, size in gruppen:
+            gewerk_counts[gewerk.value] = gewerk_counts.get(gewerk.value, 0) + count
+            type_counts[document_type] = type_counts.get(document_type, 0) + count
+            anzahl += count
+            total_size += size or 0
+        
+        letztes_upload = self.db.query(func.max(Dokument.erstellt_am)).filter(
+            Dokument.projekt_id == projekt_id
+        ).scalar()
         
         return {
-            "anzahl_dokumente": len(dokumente),
+            "anzahl_dokumente": anzahl,
             "gewerk_verteilung": gewerk_counts,
             "typ_verteilung": type_counts,
             "gesamtgroesse_mb": round(total_size / (1024 * 1024), 2),
-            "letztes_upload": (
-                max(dokumente, key=lambda x: x.erstellt_am).erstellt_am
-                if dokumente else None
-            )
-        }
-
+            "letztes_upload": letztes_upload
+        }
\ No newline at end of file
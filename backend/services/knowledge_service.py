@@ -2,8 +2,17 @@
 
 from __future__ import annotations
 
+import io
+import json
 import logging
-from typing import Dict, Iterable, List, Optional
+import random
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from sqlalchemy.orm import Session
 
@@ -13,11 +22,52 @@ from backend.models import (
     KnowledgeChunk,
     KnowledgeChunkTypeEnum,
 )
-from backend.services.rag_service import EmbeddingService, EmbeddingServiceError, serialize_embedding
+from backend.services.rag_service import (
+    EmbeddingCache,
+    EmbeddingRateLimitError,
+    EmbeddingResponse,
+    EmbeddingService,
+    EmbeddingServiceError,
+    embedding_cache_key,
+    serialize_embedding,
+)
 
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE = re.compile(r"\s+")
+
+EMBEDDING_STATUS_PENDING = "pending"
+EMBEDDING_STATUS_DONE = "done"
+EMBEDDING_STATUS_FAILED = "failed"
+
+# Ab dieser Tabellenanzahl lohnt sich der Start eines Prozess-Pools
+_PARALLEL_TABLE_THRESHOLD = 16
+
+# Spalten, die die nachgelagerte Vektorisierung an bestehenden Chunks setzt
+_EMBEDDING_COLUMNS = ("embedding_model", "embedding_vector", "embedding_dimensions", "embedding_status")
+
+# Spaltenreihenfolge für COPY ... FROM STDIN
+_COPY_COLUMNS = (
+    "id",
+    "projekt_id",
+    "dokument_id",
+    "chunk_index",
+    "chunk_type",
+    "chunk_text",
+    "source_reference",
+    "embedding_model",
+    "embedding_vector",
+    "embedding_dimensions",
+    "embedding_status",
+    "created_at",
+    "updated_at",
+)
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# Prozessweiter Cache, damit unveränderte Chunks nicht erneut eingebettet werden
+_DEFAULT_EMBEDDING_CACHE = EmbeddingCache.from_env()
+
 
 class KnowledgeBuilder:
     """Creates structured knowledge chunks from parsed document metadata."""
@@ -28,133 +78,319 @@ class KnowledgeBuilder:
         embedding_service: Optional[EmbeddingService] = None,
         max_chunk_chars: int = 1200,
         chunk_overlap: int = 150,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embed_batch_size: int = 16,
+        max_concurrent_embed_batches: int = 4,
+        embed_max_attempts: int = 3,
+        persist_batch_size: int = 500,
+        table_workers: int = 0,
     ) -> None:
+        if not 0 <= chunk_overlap < max_chunk_chars:
+            # Sonst läge jeder Folge-Chunk in der Überlappung und _split_text verwürfe den Text
+            raise ValueError("chunk_overlap muss kleiner als max_chunk_chars sein")
+
         self.db = db
         self.embedding_service = embedding_service or EmbeddingService.from_env()
+        self.embedding_cache = embedding_cache or _DEFAULT_EMBEDDING_CACHE
         self.max_chunk_chars = max_chunk_chars
         self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.max_concurrent_embed_batches = max(1, max_concurrent_embed_batches)
+        self.embed_max_attempts = max(1, embed_max_attempts)
+        self.persist_batch_size = max(1, persist_batch_size)
+        # 0 oder 1 = Tabellen seriell formatieren (Standard für Einzel-Uploads)
+        self.table_workers = table_workers
 
     def build_chunks(
         self,
         dokument: Dokument,
         metadata: Optional[DokumentMetadata],
+        embed: bool = True,
     ) -> List[KnowledgeChunk]:
-        """Generates chunk objects without persisting them."""
+        """Generates chunk objects without persisting them.
+
+        With ``embed=False`` the chunks stay in status ``pending`` and are
+        vectorised later via :meth:`embed_pending_chunks`.
+        """
 
         if metadata is None:
             logger.debug("Keine Metadaten für Dokument %s verfügbar – Knowledge-Building übersprungen.", dokument.id)
             return []
 
-        chunk_index = 0
-        chunks: List[KnowledgeChunk] = []
+        payloads: List[Dict[str, object]] = []
 
         for text_chunk in self._split_text(metadata.extrahierter_text or ""):
             if not text_chunk.strip():
                 continue
-            chunk = self._create_chunk(
-                dokument=dokument,
-                chunk_index=chunk_index,
-                chunk_type=KnowledgeChunkTypeEnum.TEXT,
-                chunk_text=text_chunk,
-                source_reference={"source": "text"},
+            payloads.append(
+                self._prepare_chunk_payload(
+                    dokument=dokument,
+                    chunk_index=len(payloads),
+                    chunk_type=KnowledgeChunkTypeEnum.TEXT,
+                    chunk_text=text_chunk,
+                    source_reference={"source": "text"},
+                )
             )
-            chunks.append(chunk)
-            chunk_index += 1
 
         for table_chunk in self._iter_table_chunks(metadata.tabellen_daten or []):
-            chunk = self._create_chunk(
-                dokument=dokument,
-                chunk_index=chunk_index,
-                chunk_type=KnowledgeChunkTypeEnum.TABLE,
-                chunk_text=table_chunk["text"],
-                source_reference=table_chunk["metadata"],
+            payloads.append(
+                self._prepare_chunk_payload(
+                    dokument=dokument,
+                    chunk_index=len(payloads),
+                    chunk_type=KnowledgeChunkTypeEnum.TABLE,
+                    chunk_text=table_chunk["text"],
+                    source_reference=table_chunk["metadata"],
+                )
             )
-            chunks.append(chunk)
-            chunk_index += 1
+
+        if embed:
+            self._attach_embeddings(payloads)
+        chunks = [KnowledgeChunk(**payload) for payload in payloads]
 
         logger.info("%s Wissenseinträge für Dokument %s erzeugt", len(chunks), dokument.id)
         return chunks
 
+    def embed_pending_chunks(self, dokument_id: str) -> int:
+        """Attaches embeddings to persisted chunks still in status ``pending``; returns the number embedded."""
+
+        if not self.embedding_service:
+            return 0
+
+        chunks = (
+            self.db.query(KnowledgeChunk)
+            .filter(
+                KnowledgeChunk.dokument_id == dokument_id,
+                KnowledgeChunk.embedding_status == EMBEDDING_STATUS_PENDING,
+            )
+            .order_by(KnowledgeChunk.chunk_index.asc())
+            .all()
+        )
+        if not chunks:
+            return 0
+
+        payloads: List[Dict[str, object]] = [{"chunk_text": chunk.chunk_text} for chunk in chunks]
+        self._attach_embeddings(payloads)
+        for chunk, payload in zip(chunks, payloads):
+            for column in _EMBEDDING_COLUMNS:
+                setattr(chunk, column, payload.get(column))
+
+        embedded = sum(chunk.embedding_status == EMBEDDING_STATUS_DONE for chunk in chunks)
+        logger.info("%s von %s Chunks für Dokument %s vektorisiert", embedded, len(chunks), dokument_id)
+        return embedded
+
     def persist_chunks(self, chunks: Iterable[KnowledgeChunk]) -> None:
-        """Persists the provided chunk objects within the associated session."""
+        """Persists the provided chunk objects with bulk INSERTs of at most ``persist_batch_size`` rows."""
+
+        for batch in self._iter_batches(chunks):
+            self.db.bulk_save_objects(batch)
+
+    def persist_chunks_copy(self, chunks: Iterable[KnowledgeChunk]) -> None:
+        """Streams the chunks via COPY FROM STDIN on PostgreSQL; other dialects use bulk INSERT."""
+
+        if self.db.get_bind().dialect.name != "postgresql":
+            self.persist_chunks(chunks)
+            return
 
-        for chunk in chunks:
-            self.db.add(chunk)
+        statement = f"COPY {KnowledgeChunk.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN"
+        raw_connection = self.db.connection().connection
+        with raw_connection.cursor() as cursor:
+            # Ein Puffer pro Batch hält den Speicherbedarf bei großen Dokumenten begrenzt
+            for batch in self._iter_batches(chunks):
+                buffer = io.StringIO()
+                buffer.writelines(self._copy_line(chunk) for chunk in batch)
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
 
-    def _create_chunk(
+    def _iter_batches(self, chunks: Iterable[KnowledgeChunk]) -> Iterator[List[KnowledgeChunk]]:
+        """Yields the chunks in lists of at most ``persist_batch_size`` without materialising all of them."""
+
+        iterator = iter(chunks)
+        while True:
+            batch = list(islice(iterator, self.persist_batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _copy_line(chunk: KnowledgeChunk) -> str:
+        """Renders one chunk as a line in PostgreSQL's COPY text format."""
+
+        now = datetime.utcnow()
+        chunk_type = chunk.chunk_type
+        values = {
+            "id": chunk.id or str(uuid.uuid4()),
+            "projekt_id": chunk.projekt_id,
+            "dokument_id": chunk.dokument_id,
+            "chunk_index": chunk.chunk_index,
+            # SQLAlchemy speichert Enum-Spalten über den Member-Namen
+            "chunk_type": chunk_type.name if isinstance(chunk_type, KnowledgeChunkTypeEnum) else chunk_type,
+            "chunk_text": chunk.chunk_text,
+            "source_reference": json.dumps(chunk.source_reference) if chunk.source_reference is not None else None,
+            "embedding_model": chunk.embedding_model,
+            "embedding_vector": f"\\x{chunk.embedding_vector.hex()}" if chunk.embedding_vector else None,
+            "embedding_dimensions": chunk.embedding_dimensions,
+            "embedding_status": chunk.embedding_status or EMBEDDING_STATUS_PENDING,
+            "created_at": (chunk.created_at or now).isoformat(),
+            "updated_at": (chunk.updated_at or now).isoformat(),
+        }
+        return "\t".join(
+            "\\N" if values[column] is None else str(values[column]).translate(_COPY_ESCAPES)
+            for column in _COPY_COLUMNS
+        ) + "\n"
+
+    def _prepare_chunk_payload(
         self,
         dokument: Dokument,
         chunk_index: int,
         chunk_type: KnowledgeChunkTypeEnum,
         chunk_text: str,
         source_reference: Optional[Dict[str, object]] = None,
-    ) -> KnowledgeChunk:
-        embedding_vector: Optional[List[float]] = None
-        embedding_model: Optional[str] = None
+    ) -> Dict[str, object]:
+        """Collects the column values of a chunk; embeddings are attached separately."""
 
-        if self.embedding_service:
-            try:
-                response = self.embedding_service.generate(chunk_text)
-                embedding_vector = response.vector
-                embedding_model = response.model
-            except EmbeddingServiceError as exc:
-                logger.warning("Embedding-Generierung fehlgeschlagen: %s", exc)
-        else:
+        return {
+            "projekt_id": dokument.projekt_id,
+            "dokument_id": dokument.id,
+            "chunk_index": chunk_index,
+            "chunk_type": chunk_type,
+            "chunk_text": chunk_text.strip(),
+            "source_reference": source_reference or {},
+            "embedding_model": None,
+            "embedding_vector": None,
+            "embedding_dimensions": None,
+            "embedding_status": EMBEDDING_STATUS_PENDING,
+        }
+
+    def _attach_embeddings(self, payloads: List[Dict[str, object]]) -> None:
+        """Generates embeddings for all payloads; cached texts are not sent again."""
+
+        if not payloads:
+            return
+
+        if not self.embedding_service:
             logger.debug("Kein Embedding-Service konfiguriert – Chunks werden ohne Vektor gespeichert.")
+            return
 
-        chunk = KnowledgeChunk(
-            projekt_id=dokument.projekt_id,
-            dokument_id=dokument.id,
-            chunk_index=chunk_index,
-            chunk_type=chunk_type,
-            chunk_text=chunk_text.strip(),
-            source_reference=source_reference or {},
-            embedding_model=embedding_model,
-            embedding_vector=serialize_embedding(embedding_vector),
-            embedding_dimensions=len(embedding_vector) if embedding_vector else None,
-        )
-        return chunk
+        model = self.embedding_service.model_name
+        texts = [str(payload["chunk_text"]) for payload in payloads]
+        keys = [embedding_cache_key(model, text) for text in texts]
+        # Die Datenbank-Stufe des Caches läuft in der Transaktion des Builders
+        vectors = self.embedding_cache.get_many(keys, session=self.db)
+
+        # Identische Chunk-Texte (z. B. seitenübergreifende Tabellenköpfe) nur einmal einbetten
+        text_by_key = dict(zip(keys, texts))
+        missing = [key for key in text_by_key if key not in vectors]
+        if missing:
+            responses = self._embed_concurrently([text_by_key[key] for key in missing])
+            generated = {
+                key: response.vector for key, response in zip(missing, responses) if response is not None
+            }
+            self.embedding_cache.set_many(generated, session=self.db)
+            vectors.update(generated)
+
+        for payload, key in zip(payloads, keys):
+            vector = vectors.get(key)
+            if vector is None or not len(vector):
+                payload["embedding_status"] = EMBEDDING_STATUS_FAILED
+                continue
+            payload["embedding_status"] = EMBEDDING_STATUS_DONE
+            payload["embedding_model"] = model
+            payload["embedding_vector"] = serialize_embedding(vector)
+            payload["embedding_dimensions"] = len(vector)
+
+    def _embed_concurrently(self, texts: List[str]) -> List[Optional[EmbeddingResponse]]:
+        """Embeds texts in sub-batches, with at most ``max_concurrent_embed_batches`` in flight."""
+
+        size = self.embed_batch_size
+        offsets = range(0, len(texts), size)
+        results: List[Optional[EmbeddingResponse]] = [None] * len(texts)
+
+        def run(offset: int) -> None:
+            batch_responses = self._embed_batch_with_retry(texts[offset:offset + size])
+            if batch_responses is not None:
+                results[offset:offset + len(batch_responses)] = batch_responses
+
+        if len(offsets) == 1:
+            run(0)
+            return results
+
+        workers = min(self.max_concurrent_embed_batches, len(offsets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed-batch") as executor:
+            list(executor.map(run, offsets))
+        return results
+
+    def _embed_batch_with_retry(self, texts: List[str]) -> Optional[List[EmbeddingResponse]]:
+        """Retries a failed batch with exponential backoff and jitter; returns None when it gives up."""
+
+        for attempt in range(1, self.embed_max_attempts + 1):
+            try:
+                return self.embedding_service.generate_batch(texts)
+            except EmbeddingServiceError as exc:
+                if attempt == self.embed_max_attempts:
+                    logger.warning("Embedding-Generierung fehlgeschlagen: %s", exc)
+                    return None
+                # Bei HTTP 429 länger warten, damit parallele Batches nicht gleichzeitig erneut anfragen
+                base = 2.0 if isinstance(exc, EmbeddingRateLimitError) else 0.5
+                time.sleep(base * 2 ** (attempt - 1) * (1 + random.random()))
+        return None
 
     def _split_text(self, text: str) -> List[str]:
         if not text:
             return []
 
-        normalized = " ".join(text.split())
-        if len(normalized) <= self.max_chunk_chars:
+        normalized = _WHITESPACE.sub(" ", text).strip()
+        max_chars = self.max_chunk_chars
+        if len(normalized) <= max_chars:
             return [normalized]
 
-        chunks: List[str] = []
-        start = 0
-        while start < len(normalized):
-            end = start + self.max_chunk_chars
-            chunk = normalized[start:end]
-            chunks.append(chunk)
-            start = max(end - self.chunk_overlap, end)
-
-        return chunks
+        # Ein Chunk, der vollständig im Überlappungsbereich des vorherigen läge, entfällt.
+        step = max(1, max_chars - self.chunk_overlap)
+        starts = range(0, len(normalized) - self.chunk_overlap, step)
+        return [normalized[start:start + max_chars] for start in starts]
 
     def _iter_table_chunks(self, tabellen_daten: Iterable[dict]) -> Iterable[Dict[str, object]]:
-        for index, table in enumerate(tabellen_daten):
-            headers = table.get("headers") or []
-            rows = table.get("rows") or table.get("data") or []
+        tables = list(tabellen_daten)
+        indexed = range(len(tables))
 
-            if not rows:
-                continue
+        if self.table_workers > 1 and len(tables) >= _PARALLEL_TABLE_THRESHOLD:
+            # Prozesse statt Threads: das Formatieren ist reine Python-Arbeit unter dem GIL
+            with ProcessPoolExecutor(max_workers=self.table_workers) as executor:
+                rendered = list(executor.map(_format_table, indexed, tables, chunksize=4))
+        else:
+            rendered = map(_format_table, indexed, tables)
 
-            lines = []
-            if headers:
-                lines.append(" | ".join(str(h) for h in headers))
+        for table_chunk in rendered:
+            if table_chunk is not None:
+                yield table_chunk
 
-            for row in rows:
-                if isinstance(row, dict):
-                    row_values = [str(row.get(h, "")) for h in headers]
-                else:
-                    row_values = [str(cell) for cell in row]
-                lines.append(" | ".join(row_values))
 
-            table_text = "\n".join(lines)
+def _format_table(index: int, table: dict) -> Optional[Dict[str, object]]:
+    """Renders one table as chunk text; module-level so it can run in a worker process."""
 
-            yield {
-                "text": table_text,
-                "metadata": {"source": "table", "table_index": index, "headers": headers},
-            }
+    headers = table.get("headers") or []
+    rows = table.get("rows") or table.get("data") or []
+
+    if not rows:
+        return None
+
+    join_cells = " | ".join
+    header_keys = tuple(headers)
+    # Standardwert je Spalte, damit dict-Zeilen komplett über map(row.get, ...) laufen
+    missing_cells = ("",) * len(header_keys)
+    offset = 1 if headers else 0
+    # Zeilenliste in voller Länge anlegen statt sie beim Anhängen wachsen zu lassen
+    lines = [""] * (len(rows) + offset)
+    if headers:
+        lines[0] = join_cells(map(str, header_keys))
+
+    for position, row in enumerate(rows, offset):
+        if isinstance(row, dict):
+            lines[position] = join_cells(map(str, map(row.get, header_keys, missing_cells)))
+        else:
+            # Listen-Zeilen direkt in C über map(str) rendern
+            lines[position] = join_cells(map(str, row))
+
+    return {
+        "text": "\n".join(lines),
+        "metadata": {"source": "table", "table_index": index, "headers": headers},
+    }
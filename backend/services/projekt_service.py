@@ -2,12 +2,17 @@
 Service layer for project management
 """
 
+from fastapi import Depends
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 import logging
 
-from models import Projekt, ProjectTypeEnum, LeistungsPhaseEnum
+from models import (
+    Befund, Dokument, DokumentMetadata, KnowledgeChunk, Projekt, PruefAuftrag, PruefProtokoll,
+    ProjectTypeEnum, LeistungsPhaseEnum,
+)
 from database import get_db
 
 logger = logging.getLogger(__name__)
@@ -61,11 +66,17 @@ class ProjektService:
         """
         return self.db.query(Projekt).filter(Projekt.id == projekt_id).first()
     
-    def hole_alle_projekte(self, limit: int = 100) -> List[Projekt]:
+    def hole_alle_projekte(self, limit: int = 100, erstellt_vor: Optional[datetime] = None) -> List[Projekt]:
         """
-        Holt alle Projekte (mit Limit)
+        Holt Projekte absteigend nach Erstellung (mit Limit)
+        
+        Für die nächste Seite wird ``erstellt_am`` des letzten Projekts als
+        ``erstellt_vor`` übergeben (Keyset-Pagination statt OFFSET).
         """
-        return self.db.query(Projekt).order_by(Projekt.erstellt_am.desc()).limit(limit).all()
+        query = self.db.query(Projekt)
+        if erstellt_vor is not None:
+            query = query.filter(Projekt.erstellt_am < erstellt_vor)
+        return query.order_by(Projekt.erstellt_am.desc()).limit(limit).all()
     
     def aktualisiere_projekt(
         self, 
@@ -118,6 +129,17 @@ class ProjektService:
             return False
         
         try:
+            # Wie in loesche_dokument: Tabellen aus älteren Versionen haben kein
+            # ON DELETE CASCADE/SET NULL, SQLite prüft die Foreign Keys aber (PRAGMA)
+            dokument_ids = select(Dokument.id).where(Dokument.projekt_id == projekt_id)
+            auftrag_ids = select(PruefAuftrag.id).where(PruefAuftrag.projekt_id == projekt_id)
+            self.db.execute(delete(DokumentMetadata).where(DokumentMetadata.dokument_id.in_(dokument_ids)))
+            self.db.execute(delete(KnowledgeChunk).where(
+                (KnowledgeChunk.projekt_id == projekt_id) | KnowledgeChunk.dokument_id.in_(dokument_ids)
+            ))
+            self.db.execute(update(Befund).where(Befund.dokument_id.in_(dokument_ids)).values(dokument_id=None))
+            self.db.execute(delete(PruefProtokoll).where(PruefProtokoll.pruefauftrag_id.in_(auftrag_ids)))
+
             self.db.delete(projekt)
             self.db.commit()
             
@@ -137,25 +159,32 @@ class ProjektService:
         if not projekt:
             return None
         
+        # Zählen in der Datenbank statt Laden der Beziehungen
+        anzahl_dokumente = self.db.query(func.count(Dokument.id)).filter(
+            Dokument.projekt_id == projekt_id
+        ).scalar()
+        anzahl_pruefauftraege, letzter_pruefauftrag = self.db.query(
+            func.count(PruefAuftrag.id),
+            func.max(PruefAuftrag.erstellt_am)
+        ).filter(
+            PruefAuftrag.projekt_id == projekt_id
+        ).one()
+        
         return {
             "projekt_id": projekt.id,
             "name": projekt.name,
             "typ": projekt.typ.value,
             "leistungsphase": projekt.leistungsphase.value,
-            "anzahl_dokumente": len(projekt.dokumente),
-            "anzahl_pruefauftraege": len(projekt.pruefauftraege),
-            "letzter_pruefauftrag": (
-                max(projekt.pruefauftraege, key=lambda x: x.erstellt_am).erstellt_am
-                if projekt.pruefauftraege else None
-            ),
+            "anzahl_dokumente": anzahl_dokumente,
+            "anzahl_pruefauftraege": anzahl_pruefauftraege,
+            "letzter_pruefauftrag": letzter_pruefauftrag,
             "erstellt_am": projekt.erstellt_am,
             "aktualisiert_am": projekt.aktualisiert_am
         }
 
 # Dependency function for FastAPI
-def get_projekt_service(db: Session = next(get_db())) -> ProjektService:
+def get_projekt_service(db: Session = Depends(get_db)) -> ProjektService:
     """
     FastAPI dependency to get ProjektService
     """
     return ProjektService(db)
-
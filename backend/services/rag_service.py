@@ -2,22 +2,80 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import os
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from urllib3.util.retry import Retry
+
+from backend.models import EmbeddingCacheEntry, KnowledgeChunk, SystemKonfiguration
+
+try:  # pragma: no cover - optional fast JSON parser
+    import orjson
+except ImportError:  # pragma: no cover - fall back to the standard library
+    orjson = None  # type: ignore[assignment]
+
+try:  # pragma: no cover - optional shared cache backend
+    import redis
+except ImportError:  # pragma: no cover - installation without redis client
+    redis = None  # type: ignore[assignment]
 
 
 logger = logging.getLogger(__name__)
 
+# Embedding-Antworten und Alt-Vektoren sind lange Float-Listen; orjson parst sie deutlich schneller
+_json_loads = orjson.loads if orjson is not None else json.loads
+
 
 class EmbeddingServiceError(RuntimeError):
     """Base error for embedding service failures."""
 
 
+class EmbeddingRateLimitError(EmbeddingServiceError):
+    """Raised when the embedding service rejects a request with HTTP 429."""
+
+
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def _http_session() -> requests.Session:
+    """Returns the process-wide HTTP session shared by all embedding services.
+
+    Keep-alive connections are reused across documents and worker threads;
+    transient gateway errors are retried by the adapter. HTTP 429 is left to
+    the caller, which backs off per batch.
+    """
+
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False,
+            )
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry))
+            session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry))
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+
 @dataclass
 class EmbeddingResponse:
     vector: List[float]
@@ -27,13 +85,24 @@ class EmbeddingResponse:
 class EmbeddingService:
     """Simple wrapper for generating embeddings via Ollama's REST API."""
 
-    def __init__(self, base_url: str, model_name: str, timeout: float = 15.0) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        timeout: float = 15.0,
+        session: Optional[requests.Session] = None,
+        max_batch_chars: int = 150_000,
+        max_batch_items: int = 32,
+    ) -> None:
         if not base_url:
             raise ValueError("base_url darf nicht leer sein")
 
         self.base_url = base_url.rstrip("/")
         self.model_name = model_name
         self.timeout = timeout
+        self.session = session or _http_session()
+        self.max_batch_chars = max(1, max_batch_chars)
+        self.max_batch_items = max(1, max_batch_items)
 
     @classmethod
     def from_env(cls) -> Optional["EmbeddingService"]:
@@ -59,18 +128,91 @@ class EmbeddingService:
         payload = {"model": self.model_name, "prompt": text}
 
         try:
-            response = requests.post(endpoint, json=payload, timeout=self.timeout)
+            response = self.session.post(endpoint, json=payload, timeout=self.timeout)
+        except requests.RequestException as exc:  # pragma: no cover - network issues
+            raise EmbeddingServiceError("Verbindung zum Ollama Embedding-Service fehlgeschlagen.") from exc
+
+        self._raise_for_status(response)
+
+        data = self._parse_json(response)
+        vector = self._extract_vector(data)
+        return EmbeddingResponse(vector=vector, model=self.model_name)
+
+    def generate_batch(self, texts: List[str]) -> List[EmbeddingResponse]:
+        """Generates embeddings for several texts, packing them into as few requests as the limits allow."""
+
+        responses: List[EmbeddingResponse] = []
+        for start, end in self._pack_batches(texts):
+            responses.extend(self._generate_request(texts[start:end]))
+        return responses
+
+    def _pack_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Greedily splits ``texts`` into index ranges within ``max_batch_chars`` and ``max_batch_items``.
+
+        A single text longer than the character limit is sent on its own.
+        """
+
+        bins = []
+        start = 0
+        chars = 0
+        for position, text in enumerate(texts):
+            length = len(text)
+            if position > start and (
+                chars + length > self.max_batch_chars or position - start >= self.max_batch_items
+            ):
+                bins.append((start, position))
+                start = position
+                chars = 0
+            chars += length
+        if start < len(texts):
+            bins.append((start, len(texts)))
+        return bins
+
+    def _generate_request(self, texts: List[str]) -> List[EmbeddingResponse]:
+        """Sends one batch request; falls back to single requests where the batch endpoint fails."""
+
+        endpoint = f"{self.base_url}/api/embed"
+        payload = {"model": self.model_name, "input": list(texts)}
+
+        try:
+            response = self.session.post(endpoint, json=payload, timeout=self.timeout)
         except requests.RequestException as exc:  # pragma: no cover - network issues
             raise EmbeddingServiceError("Verbindung zum Ollama Embedding-Service fehlgeschlagen.") from exc
 
+        if response.status_code == 404:
+            # Ältere Ollama-Versionen kennen nur /api/embeddings
+            logger.info("Batch-Endpoint /api/embed nicht verfügbar – Einzelanfragen werden genutzt.")
+            return [self.generate(text) for text in texts]
+
+        self._raise_for_status(response)
+
+        vectors = self._extract_vectors(self._parse_json(response))
+        if len(vectors) != len(texts):
+            logger.warning(
+                "Embedding-Service lieferte %s Vektoren für %s Texte – Einzelanfragen werden genutzt.",
+                len(vectors),
+                len(texts),
+            )
+            return [self.generate(text) for text in texts]
+
+        return [EmbeddingResponse(vector=list(vector), model=self.model_name) for vector in vectors]
+
+    @staticmethod
+    def _raise_for_status(response) -> None:
+        if response.status_code == 429:
+            raise EmbeddingRateLimitError("Embedding-Service hat das Anfrage-Limit erreicht (HTTP 429).")
+
         if response.status_code >= 400:
             raise EmbeddingServiceError(
                 f"Embedding-Service antwortete mit Status {response.status_code}: {response.text}"
             )
 
-        data = response.json()
-        vector = self._extract_vector(data)
-        return EmbeddingResponse(vector=vector, model=self.model_name)
+    @staticmethod
+    def _parse_json(response) -> dict:
+        try:
+            return _json_loads(response.content)
+        except ValueError as exc:
+            raise EmbeddingServiceError("Antwort des Embedding-Service ist kein gültiges JSON.") from exc
 
     @staticmethod
     def _extract_vector(payload: dict) -> List[float]:
@@ -84,28 +226,251 @@ class EmbeddingService:
 
         raise EmbeddingServiceError("Embedding-Vektor im Ollama-Response nicht gefunden.")
 
+    @staticmethod
+    def _extract_vectors(payload: dict) -> List[List[float]]:
+        """Extracts all vectors of a batch response in input order.
 
-def serialize_embedding(vector: Optional[List[float]]) -> Optional[str]:
-    """Serializes an embedding vector for persistence."""
+        Supports Ollama's ``embeddings`` list as well as the OpenAI-compatible
+        ``data`` list that some gateways in front of Ollama return.
+        """
+
+        if payload.get("embeddings"):
+            return list(payload["embeddings"])
+
+        if payload.get("data"):
+            items = sorted(payload["data"], key=lambda item: item.get("index", 0))
+            return [item["embedding"] for item in items]
+
+        if "embedding" in payload:
+            return [payload["embedding"]]
+
+        return []
+
+
+# Vektoren werden als little-endian float32 gespeichert (4 Byte pro Dimension)
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def serialize_embedding(vector: Optional[Union[List[float], np.ndarray]]) -> Optional[bytes]:
+    """Serializes an embedding vector into packed float32 bytes for persistence."""
 
     if vector is None:
         return None
 
-    return json.dumps(vector)
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
 
 
-def deserialize_embedding(payload: Optional[str]) -> Optional[List[float]]:
-    """Deserializes an embedding vector from the database."""
+def _is_legacy_json(payload: Union[bytes, str]) -> bool:
+    if isinstance(payload, str):
+        return True
+    return bytes(payload[:1]) == b"[" and bytes(payload[-1:]) == b"]"
+
+
+def deserialize_embedding(payload: Optional[Union[bytes, str]]) -> Optional[np.ndarray]:
+    """Deserializes an embedding vector from the database as a float32 array.
+
+    Callers that need plain Python floats convert with ``.tolist()`` at the edge.
+    """
 
     if not payload:
         return None
 
+    if not _is_legacy_json(payload):
+        if len(payload) % EMBEDDING_DTYPE.itemsize:
+            raise EmbeddingServiceError("Gespeicherter Embedding-Vektor hat eine ungültige Länge.")
+        return np.frombuffer(payload, dtype=EMBEDDING_DTYPE)
+
+    # Ältere Einträge wurden als JSON-Text gespeichert
     try:
-        loaded = json.loads(payload)
-    except json.JSONDecodeError as exc:  # pragma: no cover - defensive
+        loaded = _json_loads(payload)
+    except ValueError as exc:  # pragma: no cover - defensive
         raise EmbeddingServiceError("Gespeicherter Embedding-Vektor ist kein gültiges JSON.") from exc
 
     if not isinstance(loaded, list):
         raise EmbeddingServiceError("Gespeicherter Embedding-Vektor hat ein ungültiges Format.")
 
-    return [float(x) for x in loaded]
+    return np.asarray(loaded, dtype=EMBEDDING_DTYPE)
+
+
+# Markierung in system_konfiguration, dass alle Vektoren im Binärformat vorliegen
+EMBEDDING_FORMAT_KEY = "embedding_vector_format"
+
+
+def migrate_json_embeddings(session, batch_size: int = 500) -> int:
+    """Rewrites knowledge chunks whose vectors are still stored as JSON text.
+
+    Runs once per database; afterwards a marker in ``system_konfiguration``
+    short-circuits the scan. Returns the number of rewritten rows.
+    """
+
+    if session.get(SystemKonfiguration, EMBEDDING_FORMAT_KEY) is not None:
+        return 0
+
+    # Keyset-Scan über die ID: pro Durchlauf liegt nur ein Batch an Vektoren im Speicher
+    migrated = 0
+    last_id = ""
+    while True:
+        rows = session.execute(
+            select(KnowledgeChunk.id, KnowledgeChunk.embedding_vector)
+            .where(KnowledgeChunk.embedding_vector.is_not(None), KnowledgeChunk.id > last_id)
+            .order_by(KnowledgeChunk.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = [
+            {"id": chunk_id, "embedding_vector": serialize_embedding(deserialize_embedding(payload))}
+            for chunk_id, payload in rows
+            if _is_legacy_json(payload)
+        ]
+        if updates:
+            session.execute(update(KnowledgeChunk), updates)
+            migrated += len(updates)
+
+    session.add(SystemKonfiguration(
+        id=EMBEDDING_FORMAT_KEY,
+        wert="float32",
+        beschreibung="Embedding-Vektoren liegen als gepackte float32-Bytes vor",
+    ))
+    session.commit()
+    if migrated:
+        logger.info("%s Embedding-Vektoren von JSON auf float32 umgestellt", migrated)
+    return migrated
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """Builds the content-addressed cache key for a text embedded with a given model."""
+
+    return f"emb:{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache.
+
+    Lookups go through a process-local LRU, then an optional Redis instance and
+    finally the ``embedding_cache`` table when the caller passes its session.
+    The table is written inside the caller's transaction.
+    """
+
+    def __init__(self, max_entries: int = 10_000, redis_client=None) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = redis_client
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        """Uses Redis as shared backend when EMBEDDING_CACHE_REDIS_URL is configured."""
+
+        url = os.getenv("EMBEDDING_CACHE_REDIS_URL")
+        client = None
+        if url and redis is not None:
+            client = redis.Redis.from_url(url)
+        elif url:
+            logger.warning("EMBEDDING_CACHE_REDIS_URL gesetzt, aber das redis-Paket ist nicht installiert.")
+        return cls(redis_client=client)
+
+    def get_many(self, keys: Iterable[str], session=None) -> Dict[str, np.ndarray]:
+        """Returns the cached vectors for all keys that are present."""
+
+        found: Dict[str, bytes] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key in keys:
+                payload = self._entries.get(key)
+                if payload is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = payload
+
+        if missing and self._redis is not None:
+            try:
+                remote = {key: value for key, value in zip(missing, self._redis.mget(missing)) if value}
+            except redis.RedisError as exc:
+                logger.warning("Embedding-Cache (Redis) nicht erreichbar: %s", exc)
+                remote = {}
+            self._store_local(remote)
+            found.update(remote)
+            missing = [key for key in missing if key not in remote]
+
+        if missing and session is not None:
+            persisted = self._load_persisted(session, missing)
+            self._store_local(persisted)
+            found.update(persisted)
+            missing = [key for key in missing if key not in persisted]
+
+        with self._lock:
+            self.cache_hits += len(found)
+            self.cache_misses += len(missing)
+
+        return {key: deserialize_embedding(payload) for key, payload in found.items()}
+
+    def set_many(self, vectors: Dict[str, List[float]], session=None) -> None:
+        """Stores freshly generated vectors."""
+
+        payloads = {key: serialize_embedding(vector) for key, vector in vectors.items() if vector is not None}
+        if not payloads:
+            return
+
+        self._store_local(payloads)
+        if self._redis is not None:
+            try:
+                self._redis.mset(payloads)
+            except redis.RedisError as exc:
+                logger.warning("Embedding-Cache (Redis) nicht erreichbar: %s", exc)
+        if session is not None:
+            self._persist(session, payloads)
+
+    def _load_persisted(self, session, keys: List[str]) -> Dict[str, bytes]:
+        # Savepoint: ein Fehler hier darf die Transaktion des Aufrufers nicht abbrechen (PostgreSQL)
+        try:
+            with session.begin_nested():
+                rows = session.execute(
+                    select(EmbeddingCacheEntry.hash, EmbeddingCacheEntry.vector).where(
+                        EmbeddingCacheEntry.hash.in_(keys)
+                    )
+                ).all()
+        except SQLAlchemyError as exc:
+            logger.warning("Embedding-Cache (Datenbank) nicht lesbar: %s", exc)
+            return {}
+        return {row.hash: row.vector for row in rows}
+
+    def _persist(self, session, payloads: Dict[str, bytes]) -> None:
+        rows = [
+            {
+                "hash": key,
+                # Schlüsselformat emb:{model}:{sha256}; Modellnamen dürfen selbst ":" enthalten
+                "model": key[len("emb:"):].rsplit(":", 1)[0],
+                "dimensions": len(payload) // EMBEDDING_DTYPE.itemsize,
+                "vector": payload,
+            }
+            for key, payload in payloads.items()
+        ]
+
+        dialect = session.get_bind().dialect.name
+        if dialect == "sqlite":
+            statement = sqlite_insert(EmbeddingCacheEntry).on_conflict_do_nothing(index_elements=["hash"])
+        elif dialect == "postgresql":
+            statement = postgresql_insert(EmbeddingCacheEntry).on_conflict_do_nothing(index_elements=["hash"])
+        else:
+            existing = set(
+                session.scalars(select(EmbeddingCacheEntry.hash).where(EmbeddingCacheEntry.hash.in_(list(payloads))))
+            )
+            rows = [row for row in rows if row["hash"] not in existing]
+            statement = insert(EmbeddingCacheEntry)
+
+        if rows:
+            session.execute(statement, rows)
+
+    def _store_local(self, payloads: Dict[str, bytes]) -> None:
+        with self._lock:
+            for key, payload in payloads.items():
+                self._entries[key] = payload
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,81 @@
+"""
+Nachrüsten bestehender Datenbanken beim Start
+
+``Base.metadata.create_all`` legt nur fehlende Tabellen an und verändert
+bestehende nie. Die Schritte hier sind idempotent und laufen bei jedem Start.
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import LargeBinary
+
+from backend.models import Base, Dokument, KnowledgeChunk
+
+logger = logging.getLogger(__name__)
+
+# Nachträglich ergänzte Spalten mit dem Wert für bereits vorhandene Zeilen (None = NULL lassen)
+_NEUE_SPALTEN = (
+    # Vor der Hintergrund-Indexierung wurde beim Upload synchron indexiert
+    (Dokument.__table__.c.status, "'indexed'"),
+    (Dokument.__table__.c.content_sha256, None),
+    (
+        KnowledgeChunk.__table__.c.embedding_status,
+        "CASE WHEN embedding_vector IS NULL THEN 'pending' ELSE 'done' END",
+    ),
+)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Bringt Tabellen aus älteren Versionen auf den Stand der Modelle."""
+    with engine.begin() as conn:
+        # Inspector auf derselben Verbindung, sonst beendet dessen Rollback die Transaktion (StaticPool)
+        inspector = inspect(conn)
+        _migriere_embedding_spalte(conn, inspector)
+        _ergaenze_spalten(conn, inspector)
+        _ergaenze_indizes(conn, inspector)
+
+
+def _ergaenze_spalten(conn, inspector) -> None:
+    vorhanden = {}
+    for spalte, startwert in _NEUE_SPALTEN:
+        tabelle = spalte.table.name
+        if not inspector.has_table(tabelle):
+            continue
+        if tabelle not in vorhanden:
+            vorhanden[tabelle] = {eintrag["name"] for eintrag in inspector.get_columns(tabelle)}
+        if spalte.name in vorhanden[tabelle]:
+            continue
+
+        typ = spalte.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {tabelle} ADD COLUMN {spalte.name} {typ}"))
+        if startwert is not None:
+            conn.execute(text(f"UPDATE {tabelle} SET {spalte.name} = {startwert}"))
+        logger.info("Spalte %s.%s nachgerüstet", tabelle, spalte.name)
+
+
+def _ergaenze_indizes(conn, inspector) -> None:
+    # Indizes der Modelle, die create_all auf bestehenden Tabellen nicht anlegt
+    for tabelle in Base.metadata.sorted_tables:
+        if not inspector.has_table(tabelle.name):
+            continue
+        for index in tabelle.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _migriere_embedding_spalte(conn, inspector) -> None:
+    # SQLite speichert Bytes auch in einer TEXT-Spalte unverändert, nur PostgreSQL braucht bytea
+    if conn.dialect.name != "postgresql" or not inspector.has_table("knowledge_chunks"):
+        return
+
+    spalten = {spalte["name"]: spalte for spalte in inspector.get_columns("knowledge_chunks")}
+    if isinstance(spalten["embedding_vector"]["type"], LargeBinary):
+        return
+
+    # Alte JSON-Texte bleiben als UTF-8-Bytes lesbar und werden von migrate_json_embeddings umgeschrieben
+    conn.execute(text(
+        "ALTER TABLE knowledge_chunks ALTER COLUMN embedding_vector "
+        "TYPE bytea USING convert_to(embedding_vector, 'UTF8')"
+    ))
+    logger.info("knowledge_chunks.embedding_vector von text auf bytea umgestellt")
@@ -0,0 +1,41 @@
+"""
+Gepipelinetes Schreiben von Uploads auf die Festplatte
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import UploadFile
+
+# Blockgröße, in der Multipart-Daten gelesen und geschrieben werden
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def schreibe_upload(upload: UploadFile, ziel: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> int:
+    """
+    Schreibt einen Upload blockweise nach ``ziel`` und gibt die Anzahl Bytes zurück.
+
+    Der Schreibvorgang eines Blocks läuft im Executor, während bereits der
+    nächste Block aus dem Upload gelesen wird. Dadurch überlappen Festplatten-I/O
+    und Multipart-Verarbeitung, ohne den Event-Loop zu blockieren.
+    """
+    loop = asyncio.get_running_loop()
+    buffer = await loop.run_in_executor(None, open, ziel, "wb")
+    geschrieben = 0
+    pending: Optional[asyncio.Future] = None
+
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if pending is not None:
+                geschrieben += await pending
+                pending = None
+            if not chunk:
+                break
+            pending = loop.run_in_executor(None, buffer.write, chunk)
+    finally:
+        if pending is not None:
+            await asyncio.wait([pending])
+        await loop.run_in_executor(None, buffer.close)
+
+    return geschrieben
@@ -1,7 +1,26 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 
 ROOT = Path(__file__).resolve().parents[2]
-if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
+# models.py & Co. importieren "database" wie beim Start aus backend/ heraus
+for path in (ROOT, ROOT / "backend"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Dienste importieren teils "models", teils "backend.models": ein Modulobjekt,
+# sonst werden die Tabellen doppelt in Base.metadata registriert
+import backend.models  # noqa: E402
+
+sys.modules.setdefault("models", backend.models)
+
+
+@pytest.fixture(scope="session")
+def coordinator():
+    """A single TGACoordinator for the tests of its stateless check methods."""
+
+    from backend.agent_core.tga_coordinator import TGACoordinator
+
+    return TGACoordinator()
@@ -0,0 +1,126 @@
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.services import anonymization
+from backend.services.anonymization import TextSanitizer, may_contain_entities
+
+
+def test_sanitize_replaces_all_entity_types():
+    text = (
+        "Ansprechpartner Hans Müller von der Muster GmbH, 12345 Berlin, "
+        "Tel. 030/12345678, mail hans.mueller@muster.de"
+    )
+
+    result = TextSanitizer().sanitize(text)
+
+    assert "Muster GmbH" not in result.sanitized_text
+    assert "12345 Berlin" not in result.sanitized_text
+    assert "030/12345678" not in result.sanitized_text
+    assert "hans.mueller@muster.de" not in result.sanitized_text
+    assert result.replacements["COMPANY_1"] == "Muster GmbH"
+    assert result.replacements["LOCATION_1"] == "12345 Berlin"
+    assert result.replacements["PHONE_1"] == "030/12345678"
+    assert result.replacements["EMAIL_1"] == "hans.mueller@muster.de"
+    assert result.compliance_ok
+
+
+def test_sanitize_numbers_placeholders_per_entity_type():
+    result = TextSanitizer().sanitize("Telefon 030/12345678 und 089 1234 5678")
+
+    assert result.sanitized_text == "Telefon PHONE_1 und PHONE_2"
+    assert result.detected_entities == ["PHONE:030/12345678", "PHONE:089 1234 5678"]
+
+
+def test_restore_roundtrips_sanitized_text():
+    text = "Max Mustermann GmbH plant mit Erika Musterfrau in 80331 München."
+
+    result = TextSanitizer().sanitize(text)
+
+    assert result.restore(result.sanitized_text) == text
+
+
+def test_restore_distinguishes_multi_digit_placeholders():
+    text = " und ".join(f"info{i}@firma.de" for i in range(12))
+
+    result = TextSanitizer().sanitize(text)
+
+    assert "EMAIL_11" in result.sanitized_text
+    assert result.restore(result.sanitized_text) == text
+
+
+def test_sanitize_leaves_technical_text_untouched():
+    text = "Nur technischer Text ohne Personen, Vorlauf 70 °C."
+
+    result = TextSanitizer().sanitize(text)
+
+    assert result.sanitized_text == text
+    assert result.replacements == {}
+
+
+def test_prefilter_never_skips_text_with_entities():
+    assert may_contain_entities("Kontakt: Hans Müller")
+    assert may_contain_entities("Ärzte Übergabe")
+    assert may_contain_entities("info@firma.de")
+
+
+def test_sanitize_treats_control_separators_as_whitespace():
+    result = TextSanitizer().sanitize("Kontakt: Hans\x1cMüller")
+
+    assert result.sanitized_text == "Kontakt: PERSON_1"
+
+
+def test_sanitize_handles_empty_and_lowercase_text():
+    for text in ("", "nur kleinschreibung, keine zahlen und keine namen"):
+        result = TextSanitizer().sanitize(text)
+
+        assert result.sanitized_text == text
+        assert result.replacements == {}
+        assert result.detected_entities == []
+
+
+def test_prefilter_expressions_cover_every_entity_match():
+    triggers = [re.compile(expression) for expression in anonymization._prefilter_expressions()]
+    alphabet = "HMaüß AGmbH@.-/+05٣\x1c\x1f\x85\xa0\u2007\u3000\t\n"
+    rng = random.Random(1409)
+    samples = [
+        "Hans\x1cMüller",
+        "Muster\x1fGmbH",
+        "12345\x1dBerlin",
+        "030\x1e12345678",
+        "٠٣٠١٢٣٤٥٦٧",
+        "a@b.de",
+    ]
+    samples += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 16))) for _ in range(5000)]
+
+    for text in samples:
+        if anonymization.COMBINED_PATTERN.search(text):
+            assert any(trigger.search(text) for trigger in triggers), repr(text)
+
+
+def test_prefilter_expressions_skip_text_without_triggers():
+    triggers = [re.compile(expression) for expression in anonymization._prefilter_expressions()]
+
+    for text in ("", "nur kleinschreibung", "vorlauf 7 °c, rücklauf 5 °c"):
+        assert not any(trigger.search(text) for trigger in triggers)
+
+
+def test_hyperscan_prefilter_matches_control_separators():
+    pytest.importorskip("hyperscan")
+
+    assert may_contain_entities("Kontakt: Hans\x1cMüller")
+    assert not may_contain_entities("nur kleinschreibung")
+
+
+def test_sanitize_is_safe_from_concurrent_threads():
+    text = "Kontakt: Hans Müller, Muster GmbH"
+
+    def _sanitize_many(_):
+        return {TextSanitizer().sanitize(text).sanitized_text for _ in range(300)}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = set().union(*executor.map(_sanitize_many, range(8)))
+
+    assert results == {"Kontakt: PERSON_1, COMPANY_1"}
@@ -1,5 +1,8 @@
-import asyncio
+from dataclasses import replace
 from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import pytest
 
 from backend.agent_core.tga_coordinator import (
     Document,
@@ -7,143 +10,59 @@ from backend.agent_core.tga_coordinator import (
     LeistungsPhase,
     ProjectType,
     PruefAuftrag,
-    TGACoordinator,
 )
 
-
-def _run(coro):
-    return asyncio.run(coro)
+# Der Zeitstempel wird in keinem Test geprüft
+_AUFTRAG_TEMPLATE = PruefAuftrag(
+    id="auftrag-test",
+    projekt_name="Testprojekt",
+    projekt_typ=ProjectType.OFFICE,
+    leistungsphase=LeistungsPhase.LP3,
+    dokumente=[],
+    erstellt_am=datetime.now(timezone.utc),
+)
 
 
 def _auftrag(dokumente):
-    return PruefAuftrag(
-        id="auftrag-test",
-        projekt_name="Testprojekt",
-        projekt_typ=ProjectType.OFFICE,
-        leistungsphase=LeistungsPhase.LP3,
-        dokumente=dokumente,
-        erstellt_am=datetime.now(timezone.utc),
-    )
+    return replace(_AUFTRAG_TEMPLATE, dokumente=dokumente)
 
 
-def _create_document(**kwargs):
-    defaults = dict(
-        file_path="",
-        document_type="plan",
-        leistungsphase=LeistungsPhase.LP3,
-        plan_nummer="PLAN-01",
-        revision="A",
-    )
-    defaults.update(kwargs)
-    return Document(**defaults)  # type: ignore[arg-type]
+_DOC_DEFAULTS: Dict[str, Any] = {
+    "file_path": "",
+    "document_type": "plan",
+    "leistungsphase": LeistungsPhase.LP3,
+    "plan_nummer": "PLAN-01",
+    "revision": "A",
+}
 
 
-def test_pruefe_kollisionen_detects_overlap():
-    coordinator = TGACoordinator()
+def _create_document(**kwargs: Any) -> Document:
+    return Document(**{**_DOC_DEFAULTS, **kwargs})
 
-    ventilation = _create_document(
-        id="doc_lueftung",
-        filename="Lueftung.pdf",
-        gewerk=GewerkeType.KG430_LUEFTUNG,
-        metadaten={
-            "geometrie": {
-                "elemente": [
-                    {
-                        "id": "L1",
-                        "bbox": {"x": 0.0, "y": 0.0, "z": 2.6, "width": 1.5, "depth": 1.0, "height": 0.4},
-                        "plan_ref": "LP-01",
-                        "level": "EG",
-                    }
-                ]
-            }
-        },
-    )
 
-    electrical = _create_document(
-        id="doc_elektro",
-        filename="Elektro.pdf",
-        gewerk=GewerkeType.KG440_ELEKTRO,
+def _geometry_document(doc_id, filename, gewerk, element_id, plan_ref, bbox):
+    return _create_document(
+        id=doc_id,
+        filename=filename,
+        gewerk=gewerk,
         metadaten={
             "geometrie": {
-                "elemente": [
-                    {
-                        "id": "E1",
-                        "bbox": {
-                            "x": 0.8,
-                            "y": 0.5,
-                            "z": 2.5,
-                            "width": 1.0,
-                            "depth": 0.8,
-                            "height": 0.3,
-                        },
-                        "plan_ref": "EP-01",
-                        "level": "EG",
-                    }
-                ]
+                "elemente": [{"id": element_id, "bbox": bbox, "plan_ref": plan_ref, "level": "EG"}]
             }
         },
     )
 
-    auftrag = _auftrag([ventilation, electrical])
 
-    findings = _run(coordinator._pruefe_kollisionen(auftrag))
+def _ventilation_document(bbox):
+    return _geometry_document("doc_lueftung", "Lueftung.pdf", GewerkeType.KG430_LUEFTUNG, "L1", "LP-01", bbox)
 
-    assert len(findings) == 1
-    finding = findings[0]
-    assert finding.document_id == ventilation.id
-    assert "L1" in finding.beschreibung
-    assert "E1" in finding.beschreibung
-    assert finding.plan_referenz == "LP-01 / EP-01"
 
+def _electrical_document(bbox):
+    return _geometry_document("doc_elektro", "Elektro.pdf", GewerkeType.KG440_ELEKTRO, "E1", "EP-01", bbox)
 
-def test_pruefe_kollisionen_no_overlap():
-    coordinator = TGACoordinator()
 
-    ventilation = _create_document(
-        id="doc_lueftung",
-        filename="Lueftung.pdf",
-        gewerk=GewerkeType.KG430_LUEFTUNG,
-        metadaten={
-            "geometrie": {
-                "elemente": [
-                    {
-                        "id": "L1",
-                        "bbox": {"x": 0.0, "y": 0.0, "width": 1.0, "depth": 1.0},
-                        "plan_ref": "LP-01",
-                    }
-                ]
-            }
-        },
-    )
-
-    electrical = _create_document(
-        id="doc_elektro",
-        filename="Elektro.pdf",
-        gewerk=GewerkeType.KG440_ELEKTRO,
-        metadaten={
-            "geometrie": {
-                "elemente": [
-                    {
-                        "id": "E1",
-                        "bbox": {"x": 2.0, "y": 2.0, "width": 0.5, "depth": 0.5},
-                        "plan_ref": "EP-01",
-                    }
-                ]
-            }
-        },
-    )
-
-    auftrag = _auftrag([ventilation, electrical])
-
-    findings = _run(coordinator._pruefe_kollisionen(auftrag))
-
-    assert findings == []
-
-
-def test_pruefe_schnittstellen_detects_power_mismatch():
-    coordinator = TGACoordinator()
-
-    heating = _create_document(
+def _heating_interface_document(leistung_kw):
+    return _create_document(
         id="doc_heizung",
         filename="Heizung.pdf",
         gewerk=GewerkeType.KG420_HEIZUNG,
@@ -152,7 +71,7 @@ def test_pruefe_schnittstellen_detects_power_mismatch():
                 "elektro": [
                     {
                         "referenz": "WP1",
-                        "leistung_kw": 20.0,
+                        "leistung_kw": leistung_kw,
                         "versorgung": "SK5",
                         "plan_ref": "HP-01",
                     }
@@ -161,56 +80,9 @@ def test_pruefe_schnittstellen_detects_power_mismatch():
         },
     )
 
-    electrical = _create_document(
-        id="doc_elektro",
-        filename="Elektro.pdf",
-        gewerk=GewerkeType.KG440_ELEKTRO,
-        metadaten={
-            "schnittstellen": {
-                "versorgungen": [
-                    {
-                        "referenz": "SK5",
-                        "kapazitaet_kw": 15.0,
-                        "plan_ref": "EP-01",
-                    }
-                ]
-            }
-        },
-    )
-
-    auftrag = _auftrag([heating, electrical])
-
-    findings = _run(coordinator._pruefe_schnittstellen(auftrag))
-
-    assert len(findings) == 1
-    finding = findings[0]
-    assert "15.0" in finding.beschreibung
-    assert "20.0" in finding.beschreibung
-    assert finding.document_id == heating.id
-
-
-def test_pruefe_schnittstellen_consistent():
-    coordinator = TGACoordinator()
-
-    heating = _create_document(
-        id="doc_heizung",
-        filename="Heizung.pdf",
-        gewerk=GewerkeType.KG420_HEIZUNG,
-        metadaten={
-            "schnittstellen": {
-                "elektro": [
-                    {
-                        "referenz": "WP1",
-                        "leistung_kw": 18.0,
-                        "versorgung": "SK5",
-                        "plan_ref": "HP-01",
-                    }
-                ]
-            }
-        },
-    )
 
-    electrical = _create_document(
+def _electrical_supply_document(kapazitaet_kw):
+    return _create_document(
         id="doc_elektro",
         filename="Elektro.pdf",
         gewerk=GewerkeType.KG440_ELEKTRO,
@@ -219,7 +91,7 @@ def test_pruefe_schnittstellen_consistent():
                 "versorgungen": [
                     {
                         "referenz": "SK5",
-                        "kapazitaet_kw": 22.0,
+                        "kapazitaet_kw": kapazitaet_kw,
                         "plan_ref": "EP-01",
                     }
                 ]
@@ -227,76 +99,132 @@ def test_pruefe_schnittstellen_consistent():
         },
     )
 
-    auftrag = _auftrag([heating, electrical])
-
-    findings = _run(coordinator._pruefe_schnittstellen(auftrag))
 
-    assert findings == []
-
-
-def test_pruefe_sud_planung_detects_missing_confirmation():
-    coordinator = TGACoordinator()
-
-    sanitary = _create_document(
+def _sanitary_document(bestaetigt=None):
+    sud: Dict[str, Any] = {
+        "anforderungen": [
+            {
+                "id": "DW1",
+                "plan_ref": "SP-01",
+                "dimensionen": {"breite": 0.4, "hoehe": 0.4},
+                "lage": {"x": 4.0, "y": 2.0},
+            }
+        ]
+    }
+    if bestaetigt is not None:
+        sud["bestaetigt"] = bestaetigt
+    return _create_document(
         id="doc_sanitaer",
         filename="Sanitaer.pdf",
         gewerk=GewerkeType.KG410_SANITAER,
-        metadaten={
-            "sud": {
-                "anforderungen": [
-                    {
-                        "id": "DW1",
-                        "plan_ref": "SP-01",
-                        "dimensionen": {"breite": 0.4, "hoehe": 0.4},
-                        "lage": {"x": 4.0, "y": 2.0},
-                    }
-                ]
-            }
-        },
+        metadaten={"sud": sud},
     )
 
-    auftrag = _auftrag([sanitary])
 
-    findings = _run(coordinator._pruefe_sud_planung(auftrag))
+def _kollision_mit_ueberlappung():
+    return [
+        _ventilation_document({"x": 0.0, "y": 0.0, "z": 2.6, "width": 1.5, "depth": 1.0, "height": 0.4}),
+        _electrical_document({"x": 0.8, "y": 0.5, "z": 2.5, "width": 1.0, "depth": 0.8, "height": 0.3}),
+    ]
 
-    assert len(findings) == 1
-    finding = findings[0]
-    assert finding.document_id == sanitary.id
-    assert finding.prioritaet == "hoch"
 
+def _kollision_ohne_ueberlappung():
+    return [
+        _ventilation_document({"x": 0.0, "y": 0.0, "width": 1.0, "depth": 1.0}),
+        _electrical_document({"x": 2.0, "y": 2.0, "width": 0.5, "depth": 0.5}),
+    ]
 
-def test_pruefe_sud_planung_matching_confirmation():
-    coordinator = TGACoordinator()
 
-    sanitary = _create_document(
-        id="doc_sanitaer",
-        filename="Sanitaer.pdf",
-        gewerk=GewerkeType.KG410_SANITAER,
+def _kollision_mehrerer_elemente():
+    ventilation = _create_document(
+        id="doc_lueftung",
+        filename="Lueftung.pdf",
+        gewerk=GewerkeType.KG430_LUEFTUNG,
         metadaten={
-            "sud": {
-                "anforderungen": [
-                    {
-                        "id": "DW1",
-                        "plan_ref": "SP-01",
-                        "dimensionen": {"breite": 0.4, "hoehe": 0.4},
-                        "lage": {"x": 4.0, "y": 2.0},
-                    }
-                ],
-                "bestaetigt": [
-                    {
-                        "referenz": "DW1",
-                        "plan_ref": "SUD-01",
-                        "dimensionen": {"breite": 0.39, "hoehe": 0.41},
-                        "lage": {"x": 4.05, "y": 2.05},
-                    }
-                ],
+            "geometrie": {
+                "elemente": [
+                    {"id": "L1", "bbox": {"x": 0.0, "y": 0.0, "width": 2.0, "depth": 1.0}},
+                    {"id": "L2", "bbox": {"x": 1.0, "y": 0.0, "width": 2.0, "depth": 1.0}},
+                ]
             }
         },
     )
+    return [ventilation, _electrical_document({"x": 1.5, "y": 0.5, "width": 1.0, "depth": 1.0})]
+
+
+def _sud_ohne_bestaetigung():
+    return [_sanitary_document()]
+
+
+def _sud_mit_bestaetigung():
+    return [
+        _sanitary_document(
+            bestaetigt=[
+                {
+                    "referenz": "DW1",
+                    "plan_ref": "SUD-01",
+                    "dimensionen": {"breite": 0.39, "hoehe": 0.41},
+                    "lage": {"x": 4.05, "y": 2.05},
+                }
+            ]
+        )
+    ]
+
+
+# (Dokumente, Prüfmethode, erwartete Befunde); "beschreibung" listet Textfragmente
+CASES = (
+    pytest.param(
+        _kollision_mit_ueberlappung,
+        "_pruefe_kollisionen",
+        [{"document_id": "doc_lueftung", "beschreibung": ("L1", "E1"), "plan_referenz": "LP-01 / EP-01"}],
+        id="kollision-ueberlappung",
+    ),
+    pytest.param(_kollision_ohne_ueberlappung, "_pruefe_kollisionen", [], id="kollision-keine"),
+    # L1/L2 gehören zum selben Gewerk und ergeben keinen Befund
+    pytest.param(
+        _kollision_mehrerer_elemente,
+        "_pruefe_kollisionen",
+        [
+            {"id": "kollision_doc_lueftung_L1_doc_elektro_E1"},
+            {"id": "kollision_doc_lueftung_L2_doc_elektro_E1"},
+        ],
+        id="kollision-alle-paare",
+    ),
+    pytest.param(
+        lambda: [_heating_interface_document(20.0), _electrical_supply_document(15.0)],
+        "_pruefe_schnittstellen",
+        [{"document_id": "doc_heizung", "beschreibung": ("15.0", "20.0")}],
+        id="schnittstelle-leistung",
+    ),
+    pytest.param(
+        lambda: [_heating_interface_document(18.0), _electrical_supply_document(22.0)],
+        "_pruefe_schnittstellen",
+        [],
+        id="schnittstelle-konsistent",
+    ),
+    pytest.param(
+        _sud_ohne_bestaetigung,
+        "_pruefe_sud_planung",
+        [{"document_id": "doc_sanitaer", "prioritaet": "hoch"}],
+        id="sud-fehlende-bestaetigung",
+    ),
+    pytest.param(_sud_mit_bestaetigung, "_pruefe_sud_planung", [], id="sud-bestaetigt"),
+)
+
 
-    auftrag = _auftrag([sanitary])
+def _assert_findings(findings, expected: List[Dict[str, Any]]) -> None:
+    assert len(findings) == len(expected)
+    for finding, erwartet in zip(findings, expected):
+        for feld, wert in erwartet.items():
+            if feld == "beschreibung":
+                for fragment in wert:
+                    assert fragment in finding.beschreibung
+            else:
+                assert getattr(finding, feld) == wert
 
-    findings = _run(coordinator._pruefe_sud_planung(auftrag))
 
-    assert findings == []
+@pytest.mark.parametrize("docs,method,expected", CASES)
+def test_coordinator_check(coordinator, docs, method, expected):
+    findings = getattr(coordinator, method)(_auftrag(docs()))
 
+    _assert_findings(findings, expected)
@@ -0,0 +1,89 @@
+from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import (
+    Befund,
+    Dokument,
+    DokumentMetadata,
+    GewerkeTypeEnum,
+    KategorieEnum,
+    KnowledgeChunk,
+    KnowledgeChunkTypeEnum,
+    LeistungsPhaseEnum,
+    Projekt,
+    ProjectTypeEnum,
+    PrioritaetEnum,
+    PruefAuftrag,
+    PruefProtokoll,
+)
+from backend.services.dokument_service import DokumentService
+from backend.services.projekt_service import ProjektService
+from database import Base
+
+
+def _session_mit_altem_schema():
+    """SQLite mit aktiven Foreign Keys, aber ohne ON DELETE-Regeln wie vor der Umstellung."""
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def _foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    for table in metadata.tables.values():
+        for constraint in table.foreign_key_constraints:
+            constraint.ondelete = None
+    metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _lege_projekt_mit_dokument_an(session, datei):
+    session.add_all([
+        Projekt(id="projekt-1", name="Test", typ=ProjectTypeEnum.OFFICE, leistungsphase=LeistungsPhaseEnum.LP3),
+        Dokument(id="dok-1", projekt_id="projekt-1", filename="plan.pdf", file_path=str(datei),
+                 document_type="plan", gewerk=GewerkeTypeEnum.KG420_HEIZUNG),
+        DokumentMetadata(dokument_id="dok-1"),
+        KnowledgeChunk(projekt_id="projekt-1", dokument_id="dok-1", chunk_index=0,
+                       chunk_type=KnowledgeChunkTypeEnum.TEXT, chunk_text="Vorlauf 70 °C"),
+        PruefAuftrag(id="auftrag-1", projekt_id="projekt-1"),
+        Befund(id="befund-1", titel="Vorlauf", beschreibung="Zu hoch", kategorie=KategorieEnum.TECHNISCH,
+               prioritaet=PrioritaetEnum.MITTEL, gewerk=GewerkeTypeEnum.KG420_HEIZUNG, agent_quelle="test",
+               pruefauftrag_id="auftrag-1", dokument_id="dok-1"),
+        PruefProtokoll(agent_name="test", aktion="dokument_analysiert", pruefauftrag_id="auftrag-1"),
+    ])
+    session.commit()
+
+
+def test_loesche_dokument_entfernt_abhaengige_zeilen_ohne_cascade(tmp_path):
+    session = _session_mit_altem_schema()
+    datei = tmp_path / "plan.pdf"
+    datei.write_bytes(b"%PDF")
+    _lege_projekt_mit_dokument_an(session, datei)
+
+    assert DokumentService(session).loesche_dokument("dok-1") is True
+
+    assert session.query(Dokument).count() == 0
+    assert session.query(DokumentMetadata).count() == 0
+    assert session.query(KnowledgeChunk).count() == 0
+    assert session.get(Befund, "befund-1").dokument_id is None
+    assert not datei.exists()
+
+
+def test_loesche_dokument_unbekannte_id():
+    session = _session_mit_altem_schema()
+
+    assert DokumentService(session).loesche_dokument("fehlt") is False
+
+
+def test_loesche_projekt_entfernt_abhaengige_zeilen_ohne_cascade(tmp_path):
+    session = _session_mit_altem_schema()
+    _lege_projekt_mit_dokument_an(session, tmp_path / "plan.pdf")
+
+    assert ProjektService(session).loesche_projekt("projekt-1") is True
+
+    for model in (Projekt, Dokument, DokumentMetadata, KnowledgeChunk, PruefAuftrag, Befund, PruefProtokoll):
+        assert session.query(model).count() == 0
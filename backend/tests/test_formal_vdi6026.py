@@ -1,4 +1,4 @@
-import asyncio
+from dataclasses import replace
 from datetime import UTC, datetime
 
 from backend.agent_core.tga_coordinator import (
@@ -7,23 +7,23 @@ from backend.agent_core.tga_coordinator import (
     LeistungsPhase,
     ProjectType,
     PruefAuftrag,
-    TGACoordinator,
+)
+
+_AUFTRAG_TEMPLATE = PruefAuftrag(
+    id="auftrag-1",
+    projekt_name="Testprojekt",
+    projekt_typ=ProjectType.RESIDENTIAL,
+    leistungsphase=LeistungsPhase.LP3,
+    dokumente=[],
+    erstellt_am=datetime.now(UTC),
 )
 
 
 def _build_auftrag(document: Document) -> PruefAuftrag:
-    return PruefAuftrag(
-        id="auftrag-1",
-        projekt_name="Testprojekt",
-        projekt_typ=ProjectType.RESIDENTIAL,
-        leistungsphase=LeistungsPhase.LP3,
-        dokumente=[document],
-        erstellt_am=datetime.now(UTC),
-    )
+    return replace(_AUFTRAG_TEMPLATE, dokumente=[document])
 
 
-def test_vdi6026_legende_vollstaendig():
-    coordinator = TGACoordinator()
+def test_vdi6026_legende_vollstaendig(coordinator):
     document = Document(
         id="doc-1",
         filename="plan1.pdf",
@@ -43,13 +43,12 @@ def test_vdi6026_legende_vollstaendig():
     )
 
     auftrag = _build_auftrag(document)
-    findings = asyncio.run(coordinator._pruefe_vdi_6026_konformitaet(document, auftrag))
+    findings = coordinator._pruefe_vdi_6026_konformitaet(document, auftrag)
 
     assert findings == []
 
 
-def test_vdi6026_legende_fehlt_symbol():
-    coordinator = TGACoordinator()
+def test_vdi6026_legende_fehlt_symbol(coordinator):
     document = Document(
         id="doc-2",
         filename="plan2.pdf",
@@ -67,15 +66,14 @@ def test_vdi6026_legende_fehlt_symbol():
     )
 
     auftrag = _build_auftrag(document)
-    findings = asyncio.run(coordinator._pruefe_vdi_6026_konformitaet(document, auftrag))
+    findings = coordinator._pruefe_vdi_6026_konformitaet(document, auftrag)
 
     assert len(findings) == 1
     assert findings[0].prioritaet == "mittel"
     assert "Warmwasser" in findings[0].beschreibung
 
 
-def test_vdi6026_legende_nicht_verfuegbar():
-    coordinator = TGACoordinator()
+def test_vdi6026_legende_nicht_verfuegbar(coordinator):
     document = Document(
         id="doc-3",
         filename="plan3.pdf",
@@ -87,7 +85,7 @@ def test_vdi6026_legende_nicht_verfuegbar():
     )
 
     auftrag = _build_auftrag(document)
-    findings = asyncio.run(coordinator._pruefe_vdi_6026_konformitaet(document, auftrag))
+    findings = coordinator._pruefe_vdi_6026_konformitaet(document, auftrag)
 
     assert len(findings) == 1
     assert findings[0].prioritaet == "hinweis"
@@ -1,97 +1,103 @@
 from __future__ import annotations
 
+import copy
 from typing import Dict, Iterable
 
+import pytest
+
 from backend.agent_core.checks.kg420_heating import evaluate
 
 
-def base_context() -> Dict[str, object]:
-    return {
-        "projekt_typ": "buerogebaeude",
-        "heating_load": {
-            "rooms": [
-                {
-                    "name": "Raum A",
-                    "heizlast": 40.0,
-                    "spezifische_heizlast": 60.0,
-                }
-            ],
-            "total": 40.0,
-        },
-        "system": {
-            "supply_temperature": 60.0,
-            "return_temperature": 45.0,
-            "pressure": 2.0,
-            "hydraulic_balancing": True,
-            "components": [
-                "wärmeerzeuger",
-                "umwälzpumpe",
-                "ausdehnungsgefäß",
-                "sicherheitsventil",
-                "manometer",
-            ],
-        },
-        "generator": {
-            "leistung": 50.0,
-            "typ": "gaskessel",
-            "wirkungsgrad": 0.95,
-        },
-    }
+_BASE_CONTEXT: Dict[str, object] = {
+    "projekt_typ": "buerogebaeude",
+    "heating_load": {
+        "rooms": [
+            {
+                "name": "Raum A",
+                "heizlast": 40.0,
+                "spezifische_heizlast": 60.0,
+            }
+        ],
+        "total": 40.0,
+    },
+    "system": {
+        "supply_temperature": 60.0,
+        "return_temperature": 45.0,
+        "pressure": 2.0,
+        "hydraulic_balancing": True,
+        "components": [
+            "wärmeerzeuger",
+            "umwälzpumpe",
+            "ausdehnungsgefäß",
+            "sicherheitsventil",
+            "manometer",
+        ],
+    },
+    "generator": {
+        "leistung": 50.0,
+        "typ": "gaskessel",
+        "wirkungsgrad": 0.95,
+    },
+}
 
 
-def finding_ids(findings: Iterable[object]) -> set[str]:
-    return {finding.id for finding in findings}  # type: ignore[attr-defined]
-
-
-def test_requires_room_data_negative():
-    context = base_context()
-    context["heating_load"]["rooms"] = []  # type: ignore[index]
+def base_context() -> Dict[str, object]:
+    return copy.deepcopy(_BASE_CONTEXT)
 
-    findings = evaluate(context)
 
-    assert finding_ids(findings) == {"kg420_0001"}
+def context_with(section: str, **overrides: object) -> Dict[str, object]:
+    """Kopiert nur den geänderten Abschnitt, der Rest wird mit der Vorlage geteilt."""
+    section_values = {**_BASE_CONTEXT[section], **overrides}  # type: ignore[dict-item]
+    return {**_BASE_CONTEXT, section: section_values}
 
 
-def test_requires_room_data_positive():
-    context = base_context()
+def context_with_room(**overrides: object) -> Dict[str, object]:
+    heating_load = _BASE_CONTEXT["heating_load"]
+    room = {**heating_load["rooms"][0], **overrides}  # type: ignore[index]
+    return {**_BASE_CONTEXT, "heating_load": {**heating_load, "rooms": [room]}}
 
-    findings = evaluate(context)
 
-    assert "kg420_0001" not in finding_ids(findings)
+def finding_ids(findings: Iterable[object]) -> set[str]:
+    return {finding.id for finding in findings}  # type: ignore[attr-defined]
 
 
-def test_specific_load_too_high_negative():
-    context = base_context()
-    context["heating_load"]["rooms"][0]["spezifische_heizlast"] = 120.0  # type: ignore[index]
+def has_finding(findings: Iterable[object], finding_id: str) -> bool:
+    return any(finding.id == finding_id for finding in findings)  # type: ignore[attr-defined]
 
-    findings = evaluate(context)
 
-    assert "kg420_room_Raum A_hoch" in finding_ids(findings)
+@pytest.fixture(scope="module")
+def base_finding_ids() -> set[str]:
+    return finding_ids(evaluate(base_context()))
 
 
-def test_specific_load_too_high_positive():
+def test_requires_room_data_negative():
     context = base_context()
+    context["heating_load"]["rooms"] = []  # type: ignore[index]
 
     findings = evaluate(context)
 
-    assert "kg420_room_Raum A_hoch" not in finding_ids(findings)
-
+    assert [finding.id for finding in findings] == ["kg420_0001"]
 
-def test_specific_load_too_low_negative():
-    context = base_context()
-    context["heating_load"]["rooms"][0]["spezifische_heizlast"] = 20.0  # type: ignore[index]
 
-    findings = evaluate(context)
+def test_requires_room_data_positive(base_finding_ids):
+    assert "kg420_0001" not in base_finding_ids
 
-    assert "kg420_room_Raum A_niedrig" in finding_ids(findings)
 
-
-def test_specific_load_too_low_positive():
-    context = base_context()
+@pytest.mark.parametrize(
+    "spezifische_heizlast,finding_id,expected",
+    (
+        (120.0, "kg420_room_Raum A_hoch", True),
+        (60.0, "kg420_room_Raum A_hoch", False),
+        (20.0, "kg420_room_Raum A_niedrig", True),
+        (60.0, "kg420_room_Raum A_niedrig", False),
+    ),
+)
+def test_specific_load_limits(spezifische_heizlast, finding_id, expected):
+    context = context_with_room(spezifische_heizlast=spezifische_heizlast)
 
     findings = evaluate(context)
 
-    assert "kg420_room_Raum A_niedrig" not in finding_ids(findings)
+    assert has_finding(findings, finding_id) is expected
 
 
 def test_small_room_loads_in_watts_do_not_trigger_generator_warning():
@@ -117,176 +123,104 @@ def test_small_room_loads_in_watts_do_not_trigger_generator_warning():
 
     findings = evaluate(context)
 
-    assert "kg420_erzeuger_001" not in finding_ids(findings)
-
-
-def test_supply_temperature_limit_negative():
-    context = base_context()
-    context["system"]["supply_temperature"] = 75.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_vorlauf_001" in finding_ids(findings)
-
-
-def test_supply_temperature_limit_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg420_vorlauf_001" not in finding_ids(findings)
-
-
-def test_return_temperature_limit_negative():
-    context = base_context()
-    context["system"]["return_temperature"] = 60.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_ruecklauf_001" in finding_ids(findings)
-
-
-def test_return_temperature_limit_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg420_ruecklauf_001" not in finding_ids(findings)
+    assert not has_finding(findings, "kg420_erzeuger_001")
 
 
-def test_delta_t_too_small_negative():
-    context = base_context()
-    context["system"]["supply_temperature"] = 50.0  # type: ignore[index]
-    context["system"]["return_temperature"] = 47.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_deltaT_001" in finding_ids(findings)
-
-
-def test_delta_t_too_small_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg420_deltaT_001" not in finding_ids(findings)
-
-
-def test_pressure_minimum_negative():
-    context = base_context()
-    context["system"]["pressure"] = 1.0  # type: ignore[index]
+@pytest.mark.parametrize("supply_temperature,expected", ((75.0, True), (60.0, False)))
+def test_supply_temperature_limit(supply_temperature, expected):
+    context = context_with("system", supply_temperature=supply_temperature)
 
     findings = evaluate(context)
 
-    assert "kg420_druck_min" in finding_ids(findings)
+    assert has_finding(findings, "kg420_vorlauf_001") is expected
 
 
-def test_pressure_minimum_positive():
-    context = base_context()
+@pytest.mark.parametrize("return_temperature,expected", ((60.0, True), (45.0, False)))
+def test_return_temperature_limit(return_temperature, expected):
+    context = context_with("system", return_temperature=return_temperature)
 
     findings = evaluate(context)
 
-    assert "kg420_druck_min" not in finding_ids(findings)
+    assert has_finding(findings, "kg420_ruecklauf_001") is expected
 
 
-def test_pressure_maximum_negative():
-    context = base_context()
-    context["system"]["pressure"] = 3.5  # type: ignore[index]
+@pytest.mark.parametrize(
+    "supply_temperature,return_temperature,expected",
+    ((50.0, 47.0, True), (60.0, 45.0, False)),
+)
+def test_delta_t_too_small(supply_temperature, return_temperature, expected):
+    context = context_with(
+        "system", supply_temperature=supply_temperature, return_temperature=return_temperature
+    )
 
     findings = evaluate(context)
 
-    assert "kg420_druck_max" in finding_ids(findings)
+    assert has_finding(findings, "kg420_deltaT_001") is expected
 
 
-def test_pressure_maximum_positive():
-    context = base_context()
+@pytest.mark.parametrize(
+    "pressure,finding_id,expected",
+    (
+        (1.0, "kg420_druck_min", True),
+        (2.0, "kg420_druck_min", False),
+        (3.5, "kg420_druck_max", True),
+        (2.0, "kg420_druck_max", False),
+    ),
+)
+def test_pressure_limits(pressure, finding_id, expected):
+    context = context_with("system", pressure=pressure)
 
     findings = evaluate(context)
 
-    assert "kg420_druck_max" not in finding_ids(findings)
+    assert has_finding(findings, finding_id) is expected
 
 
-def test_requires_hydraulic_balancing_negative():
-    context = base_context()
-    context["system"]["hydraulic_balancing"] = False  # type: ignore[index]
+@pytest.mark.parametrize("hydraulic_balancing,expected", ((False, True), (True, False)))
+def test_requires_hydraulic_balancing(hydraulic_balancing, expected):
+    context = context_with("system", hydraulic_balancing=hydraulic_balancing)
 
     findings = evaluate(context)
 
-    assert "kg420_hydraulik_001" in finding_ids(findings)
+    assert has_finding(findings, "kg420_hydraulik_001") is expected
 
 
-def test_requires_hydraulic_balancing_positive():
-    context = base_context()
+@pytest.mark.parametrize(
+    "components,expected",
+    (
+        (["wärmeerzeuger", "umwälzpumpe"], True),
+        (_BASE_CONTEXT["system"]["components"], False),  # type: ignore[index]
+    ),
+)
+def test_required_components(components, expected):
+    context = context_with("system", components=list(components))
 
     findings = evaluate(context)
 
-    assert "kg420_hydraulik_001" not in finding_ids(findings)
+    assert has_finding(findings, "kg420_komponenten_001") is expected
 
 
-def test_required_components_negative():
-    context = base_context()
-    context["system"]["components"] = ["wärmeerzeuger", "umwälzpumpe"]  # type: ignore[index]
+@pytest.mark.parametrize("leistung,expected", ((40.0, True), (50.0, False)))
+def test_generator_margin(leistung, expected):
+    context = context_with("generator", leistung=leistung)
 
     findings = evaluate(context)
 
-    assert "kg420_komponenten_001" in finding_ids(findings)
+    assert has_finding(findings, "kg420_erzeuger_001") is expected
 
 
-def test_required_components_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg420_komponenten_001" not in finding_ids(findings)
-
-
-def test_generator_margin_negative():
-    context = base_context()
-    context["generator"]["leistung"] = 40.0  # type: ignore[index]
+@pytest.mark.parametrize("cop,expected", ((3.0, True), (3.6, False)))
+def test_heat_pump_cop(cop, expected):
+    context = context_with("generator", typ="waermepumpe", cop=cop)
 
     findings = evaluate(context)
 
-    assert "kg420_erzeuger_001" in finding_ids(findings)
+    assert has_finding(findings, "kg420_wp_001") is expected
 
 
-def test_generator_margin_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg420_erzeuger_001" not in finding_ids(findings)
-
-
-def test_heat_pump_cop_negative():
-    context = base_context()
-    context["generator"].update({"typ": "waermepumpe", "cop": 3.0})  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_wp_001" in finding_ids(findings)
-
-
-def test_heat_pump_cop_positive():
-    context = base_context()
-    context["generator"].update({"typ": "waermepumpe", "cop": 3.6})  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_wp_001" not in finding_ids(findings)
-
-
-def test_boiler_efficiency_negative():
-    context = base_context()
-    context["generator"]["wirkungsgrad"] = 0.9  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg420_kessel_001" in finding_ids(findings)
-
-
-def test_boiler_efficiency_positive():
-    context = base_context()
+@pytest.mark.parametrize("wirkungsgrad,expected", ((0.9, True), (0.95, False)))
+def test_boiler_efficiency(wirkungsgrad, expected):
+    context = context_with("generator", wirkungsgrad=wirkungsgrad)
 
     findings = evaluate(context)
 
-    assert "kg420_kessel_001" not in finding_ids(findings)
+    assert has_finding(findings, "kg420_kessel_001") is expected
@@ -2,188 +2,135 @@ from __future__ import annotations
 
 from typing import Dict, Iterable
 
+import pytest
+
 from backend.agent_core.checks.kg430_ventilation import evaluate
 
 
-def base_context() -> Dict[str, object]:
-    return {
-        "projekt_typ": "buerogebaeude",
-        "rooms": [
-            {
-                "name": "Raum A",
-                "zuluft": 360.0,
-                "abluft": 360.0,
-                "persons": 10,
-                "air_change": 4.0,
-                "co2": 800.0,
-            }
-        ],
-        "anlagen": [
-            {
-                "id": "AHU1",
-                "volumenstrom": 1400.0,
-                "waermerueckgewinnung": True,
-                "wrg_wirkungsgrad": 0.8,
-                "filterklassen": ["F7"],
-            }
-        ],
-    }
+# Wird nie verändert; Varianten entstehen über context_with_first()
+_BASE_CONTEXT: Dict[str, object] = {
+    "projekt_typ": "buerogebaeude",
+    "rooms": [
+        {
+            "name": "Raum A",
+            "zuluft": 360.0,
+            "abluft": 360.0,
+            "persons": 10,
+            "air_change": 4.0,
+            "co2": 800.0,
+        }
+    ],
+    "anlagen": [
+        {
+            "id": "AHU1",
+            "volumenstrom": 1400.0,
+            "waermerueckgewinnung": True,
+            "wrg_wirkungsgrad": 0.8,
+            "filterklassen": ["F7"],
+        }
+    ],
+}
+
+
+def context_with_first(section: str, **overrides: object) -> Dict[str, object]:
+    """Ersetzt nur den ersten Eintrag von ``section``; alle anderen Teile bleiben geteilt."""
+    first = {**_BASE_CONTEXT[section][0], **overrides}  # type: ignore[index]
+    return {**_BASE_CONTEXT, section: [first, *_BASE_CONTEXT[section][1:]]}  # type: ignore[index]
 
 
 def finding_ids(findings: Iterable[object]) -> set[str]:
     return {finding.id for finding in findings}  # type: ignore[attr-defined]
 
 
-def test_requires_room_data_negative():
-    context = base_context()
-    context["rooms"] = []  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert finding_ids(findings) == {"kg430_0001"}
-
-
-def test_requires_room_data_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg430_0001" not in finding_ids(findings)
-
-
-def test_outdoor_air_volume_negative():
-    context = base_context()
-    context["rooms"][0]["zuluft"] = 200.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_luftmenge" in finding_ids(findings)
-
-
-def test_outdoor_air_volume_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_luftmenge" not in finding_ids(findings)
-
-
-def test_air_change_too_low_negative():
-    context = base_context()
-    context["rooms"][0]["air_change"] = 0.3  # type: ignore[index]
-
-    findings = evaluate(context)
+def has_finding(findings: Iterable[object], finding_id: str) -> bool:
+    return any(finding.id == finding_id for finding in findings)  # type: ignore[attr-defined]
 
-    assert "kg430_Raum A_wechsel_min" in finding_ids(findings)
 
+@pytest.fixture(scope="module")
+def base_finding_ids() -> set[str]:
+    return finding_ids(evaluate(_BASE_CONTEXT))
 
-def test_air_change_too_low_positive():
-    context = base_context()
 
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_wechsel_min" not in finding_ids(findings)
-
-
-def test_air_change_too_high_negative():
-    context = base_context()
-    context["rooms"][0]["air_change"] = 7.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_wechsel_max" in finding_ids(findings)
-
-
-def test_air_change_too_high_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_wechsel_max" not in finding_ids(findings)
-
-
-def test_co2_limit_negative():
-    context = base_context()
-    context["rooms"][0]["co2"] = 1200.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg430_Raum A_co2" in finding_ids(findings)
-
-
-def test_co2_limit_positive():
-    context = base_context()
+def test_requires_room_data_negative():
+    context = {**_BASE_CONTEXT, "rooms": []}
 
     findings = evaluate(context)
 
-    assert "kg430_Raum A_co2" not in finding_ids(findings)
-
+    assert [finding.id for finding in findings] == ["kg430_0001"]
 
-def test_supply_exhaust_balance_negative():
-    context = base_context()
-    context["rooms"][0]["zuluft"] = 500.0  # type: ignore[index]
-    context["rooms"][0]["abluft"] = 300.0  # type: ignore[index]
-
-    findings = evaluate(context)
 
-    assert "kg430_balance_001" in finding_ids(findings)
+def test_requires_room_data_positive(base_finding_ids):
+    assert "kg430_0001" not in base_finding_ids
 
 
-def test_supply_exhaust_balance_positive():
-    context = base_context()
+@pytest.mark.parametrize("zuluft,expected", ((200.0, True), (360.0, False)))
+def test_outdoor_air_volume(zuluft, expected):
+    context = context_with_first("rooms", zuluft=zuluft)
 
     findings = evaluate(context)
 
-    assert "kg430_balance_001" not in finding_ids(findings)
+    assert has_finding(findings, "kg430_Raum A_luftmenge") is expected
 
 
-def test_wrg_required_negative():
-    context = base_context()
-    context["anlagen"][0].update({"volumenstrom": 2000.0, "waermerueckgewinnung": False})  # type: ignore[index]
+@pytest.mark.parametrize(
+    "air_change,finding_id,expected",
+    (
+        (0.3, "kg430_Raum A_wechsel_min", True),
+        (4.0, "kg430_Raum A_wechsel_min", False),
+        (7.0, "kg430_Raum A_wechsel_max", True),
+        (4.0, "kg430_Raum A_wechsel_max", False),
+    ),
+)
+def test_air_change_limits(air_change, finding_id, expected):
+    context = context_with_first("rooms", air_change=air_change)
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_wrg" in finding_ids(findings)
+    assert has_finding(findings, finding_id) is expected
 
 
-def test_wrg_required_positive():
-    context = base_context()
-    context["anlagen"][0].update({"volumenstrom": 2000.0, "waermerueckgewinnung": True})  # type: ignore[index]
+@pytest.mark.parametrize("co2,expected", ((1200.0, True), (800.0, False)))
+def test_co2_limit(co2, expected):
+    context = context_with_first("rooms", co2=co2)
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_wrg" not in finding_ids(findings)
+    assert has_finding(findings, "kg430_Raum A_co2") is expected
 
 
-def test_wrg_efficiency_negative():
-    context = base_context()
-    context["anlagen"][0]["wrg_wirkungsgrad"] = 0.6  # type: ignore[index]
+@pytest.mark.parametrize("zuluft,abluft,expected", ((500.0, 300.0, True), (360.0, 360.0, False)))
+def test_supply_exhaust_balance(zuluft, abluft, expected):
+    context = context_with_first("rooms", zuluft=zuluft, abluft=abluft)
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_eta" in finding_ids(findings)
+    assert has_finding(findings, "kg430_balance_001") is expected
 
 
-def test_wrg_efficiency_positive():
-    context = base_context()
+@pytest.mark.parametrize("waermerueckgewinnung,expected", ((False, True), (True, False)))
+def test_wrg_required(waermerueckgewinnung, expected):
+    context = context_with_first(
+        "anlagen", volumenstrom=2000.0, waermerueckgewinnung=waermerueckgewinnung
+    )
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_eta" not in finding_ids(findings)
+    assert has_finding(findings, "kg430_AHU1_wrg") is expected
 
 
-def test_filter_class_negative():
-    context = base_context()
-    context["anlagen"][0]["filterklassen"] = ["F5"]  # type: ignore[index]
+@pytest.mark.parametrize("wrg_wirkungsgrad,expected", ((0.6, True), (0.8, False)))
+def test_wrg_efficiency(wrg_wirkungsgrad, expected):
+    context = context_with_first("anlagen", wrg_wirkungsgrad=wrg_wirkungsgrad)
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_filter" in finding_ids(findings)
+    assert has_finding(findings, "kg430_AHU1_eta") is expected
 
 
-def test_filter_class_positive():
-    context = base_context()
+@pytest.mark.parametrize("filterklassen,expected", ((["F5"], True), (["F7"], False)))
+def test_filter_class(filterklassen, expected):
+    context = context_with_first("anlagen", filterklassen=filterklassen)
 
     findings = evaluate(context)
 
-    assert "kg430_AHU1_filter" not in finding_ids(findings)
+    assert has_finding(findings, "kg430_AHU1_filter") is expected
@@ -1,131 +1,107 @@
 from __future__ import annotations
 
+import copy
 from typing import Dict, Iterable
 
-from backend.agent_core.checks.kg440_electrical import evaluate
-
-
-def base_context() -> Dict[str, object]:
-    return {
-        "projekt_typ": "buerogebaeude",
-        "stromkreise": [
-            {
-                "name": "SK1",
-                "voltage_drop_percent": 2.0,
-                "diversity_factor": 0.8,
-                "reserve_percent": 15.0,
-            }
-        ],
-        "beleuchtung": [
-            {
-                "id": "B1",
-                "name": "Open Space",
-                "flaeche": 100.0,
-                "leistung": 1000.0,
-                "nutzung": "buerogebaeude",
-            }
-        ],
-        "verbraucher": [
-            {
-                "bereich": "rechenzentrum",
-                "usv_erforderlich": True,
-            },
-            {
-                "bereich": "operationssaal",
-                "usv_erforderlich": True,
-            },
-        ],
-        "notbeleuchtung": {"nachweis": True},
-    }
-
-
-def finding_ids(findings: Iterable[object]) -> set[str]:
-    return {finding.id for finding in findings}  # type: ignore[attr-defined]
-
-
-def test_requires_circuit_data_negative():
-    context = base_context()
-    context["stromkreise"] = []  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert finding_ids(findings) == {"kg440_0001"}
-
-
-def test_requires_circuit_data_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg440_0001" not in finding_ids(findings)
-
-
-def test_voltage_drop_limit_negative():
-    context = base_context()
-    context["stromkreise"][0]["voltage_drop_percent"] = 4.0  # type: ignore[index]
-
-    findings = evaluate(context)
+import pytest
 
-    assert "kg440_SK1_spannung" in finding_ids(findings)
+from backend.agent_core.checks.kg440_electrical import evaluate
 
 
-def test_voltage_drop_limit_positive():
-    context = base_context()
+_BASE_CONTEXT: Dict[str, object] = {
+    "projekt_typ": "buerogebaeude",
+    "stromkreise": [
+        {
+            "name": "SK1",
+            "voltage_drop_percent": 2.0,
+            "diversity_factor": 0.8,
+            "reserve_percent": 15.0,
+        }
+    ],
+    "beleuchtung": [
+        {
+            "id": "B1",
+            "name": "Open Space",
+            "flaeche": 100.0,
+            "leistung": 1000.0,
+            "nutzung": "buerogebaeude",
+        }
+    ],
+    "verbraucher": [
+        {
+            "bereich": "rechenzentrum",
+            "usv_erforderlich": True,
+        },
+        {
+            "bereich": "operationssaal",
+            "usv_erforderlich": True,
+        },
+    ],
+    "notbeleuchtung": {"nachweis": True},
+}
 
-    findings = evaluate(context)
 
-    assert "kg440_SK1_spannung" not in finding_ids(findings)
+def base_context() -> Dict[str, object]:
+    return copy.deepcopy(_BASE_CONTEXT)
 
 
-def test_diversity_factor_range_negative():
-    context = base_context()
-    context["stromkreise"][0]["diversity_factor"] = 0.95  # type: ignore[index]
+def context_with_first(section: str, **overrides: object) -> Dict[str, object]:
+    first = {**_BASE_CONTEXT[section][0], **overrides}  # type: ignore[index]
+    return {**_BASE_CONTEXT, section: [first, *_BASE_CONTEXT[section][1:]]}  # type: ignore[index]
 
-    findings = evaluate(context)
 
-    assert "kg440_SK1_diversity" in finding_ids(findings)
+def finding_ids(findings: Iterable[object]) -> set[str]:
+    return {finding.id for finding in findings}  # type: ignore[attr-defined]
 
 
-def test_diversity_factor_range_positive():
-    context = base_context()
+def has_finding(findings: Iterable[object], finding_id: str) -> bool:
+    return any(finding.id == finding_id for finding in findings)  # type: ignore[attr-defined]
 
-    findings = evaluate(context)
 
-    assert "kg440_SK1_diversity" not in finding_ids(findings)
+@pytest.fixture(scope="module")
+def base_finding_ids() -> set[str]:
+    return finding_ids(evaluate(base_context()))
 
 
-def test_reserve_limit_negative():
+def test_requires_circuit_data_negative():
     context = base_context()
-    context["stromkreise"][0]["reserve_percent"] = 5.0  # type: ignore[index]
+    context["stromkreise"] = []  # type: ignore[index]
 
     findings = evaluate(context)
 
-    assert "kg440_SK1_reserve" in finding_ids(findings)
+    assert [finding.id for finding in findings] == ["kg440_0001"]
 
 
-def test_reserve_limit_positive():
-    context = base_context()
+def test_requires_circuit_data_positive(base_finding_ids):
+    assert "kg440_0001" not in base_finding_ids
 
-    findings = evaluate(context)
 
-    assert "kg440_SK1_reserve" not in finding_ids(findings)
-
-
-def test_lighting_density_negative():
-    context = base_context()
-    context["beleuchtung"][0]["leistung"] = 1500.0  # type: ignore[index]
+@pytest.mark.parametrize(
+    "field,value,finding_id,expected",
+    (
+        ("voltage_drop_percent", 4.0, "kg440_SK1_spannung", True),
+        ("voltage_drop_percent", 2.0, "kg440_SK1_spannung", False),
+        ("diversity_factor", 0.95, "kg440_SK1_diversity", True),
+        ("diversity_factor", 0.8, "kg440_SK1_diversity", False),
+        ("reserve_percent", 5.0, "kg440_SK1_reserve", True),
+        ("reserve_percent", 15.0, "kg440_SK1_reserve", False),
+    ),
+)
+def test_circuit_limits(field, value, finding_id, expected):
+    context = context_with_first("stromkreise", **{field: value})
 
     findings = evaluate(context)
 
-    assert "kg440_beleuchtung_B1" in finding_ids(findings)
+    assert has_finding(findings, finding_id) is expected
 
 
-def test_lighting_density_positive():
-    context = base_context()
+@pytest.mark.parametrize("leistung,expected", ((1500.0, True), (1000.0, False)))
+def test_lighting_density(leistung, expected):
+    context = context_with_first("beleuchtung", leistung=leistung)
 
     findings = evaluate(context)
 
-    assert "kg440_beleuchtung_B1" not in finding_ids(findings)
+    assert has_finding(findings, "kg440_beleuchtung_B1") is expected
 
 
 def test_emergency_lighting_required_negative():
@@ -134,15 +110,11 @@ def test_emergency_lighting_required_negative():
 
     findings = evaluate(context)
 
-    assert "kg440_notbeleuchtung" in finding_ids(findings)
+    assert has_finding(findings, "kg440_notbeleuchtung")
 
 
-def test_emergency_lighting_required_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg440_notbeleuchtung" not in finding_ids(findings)
+def test_emergency_lighting_required_positive(base_finding_ids):
+    assert "kg440_notbeleuchtung" not in base_finding_ids
 
 
 def test_ups_requirement_negative():
@@ -155,11 +127,6 @@ def test_ups_requirement_negative():
     assert {"kg440_usv_rechenzentrum", "kg440_usv_operationssaal"} <= ids
 
 
-def test_ups_requirement_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    ids = finding_ids(findings)
-    assert "kg440_usv_rechenzentrum" not in ids
-    assert "kg440_usv_operationssaal" not in ids
+def test_ups_requirement_positive(base_finding_ids):
+    assert "kg440_usv_rechenzentrum" not in base_finding_ids
+    assert "kg440_usv_operationssaal" not in base_finding_ids
@@ -1,149 +1,129 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable
+import copy
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Tuple, Union
 
-from backend.agent_core.checks.kg474_fire_suppression import evaluate
-
-
-def base_context() -> Dict[str, object]:
-    return {
-        "sprinkler": [
-            {
-                "name": "Zone A",
-                "gefährdungsklasse": "hoch",
-                "berechnete_dichte": 5.0,
-                "loescheinwirkzeit": 35.0,
-                "pumpenredundanz": True,
-            }
-        ],
-        "hydranten": [
-            {
-                "name": "Hydrant 1",
-                "volumenstrom": 250.0,
-                "druck": 0.5,
-            }
-        ],
-        "wasserversorgung": {"dauer": 40.0},
-    }
-
-
-def finding_ids(findings: Iterable[object]) -> set[str]:
-    return {finding.id for finding in findings}  # type: ignore[attr-defined]
-
-
-def test_requires_any_system_negative():
-    context: Dict[str, object] = {"sprinkler": [], "hydranten": []}
-
-    findings = evaluate(context)
-
-    assert finding_ids(findings) == {"kg474_0001"}
-
-
-def test_requires_any_system_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg474_0001" not in finding_ids(findings)
-
-
-def test_sprinkler_density_negative():
-    context = base_context()
-    context["sprinkler"][0]["berechnete_dichte"] = 1.0  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg474_Zone A_dichte" in finding_ids(findings)
-
-
-def test_sprinkler_density_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg474_Zone A_dichte" not in finding_ids(findings)
-
-
-def test_sprinkler_duration_negative():
-    context = base_context()
-    context["sprinkler"][0]["loescheinwirkzeit"] = 20.0  # type: ignore[index]
-
-    findings = evaluate(context)
+import pytest
 
-    assert "kg474_Zone A_dauer" in finding_ids(findings)
-
-
-def test_sprinkler_duration_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg474_Zone A_dauer" not in finding_ids(findings)
-
-
-def test_pump_redundancy_negative():
-    context = base_context()
-    context["sprinkler"][0]["pumpenredundanz"] = False  # type: ignore[index]
-
-    findings = evaluate(context)
-
-    assert "kg474_Zone A_pumpe" in finding_ids(findings)
-
-
-def test_pump_redundancy_positive():
-    context = base_context()
-
-    findings = evaluate(context)
-
-    assert "kg474_Zone A_pumpe" not in finding_ids(findings)
+from backend.agent_core.checks.kg474_fire_suppression import evaluate
 
 
-def test_hydrant_flow_negative():
-    context = base_context()
-    context["hydranten"][0]["volumenstrom"] = 150.0  # type: ignore[index]
+# Nur über base_context() oder base_context_view verwenden, nie direkt verändern
+_BASE_CONTEXT: Dict[str, object] = {
+    "sprinkler": [
+        {
+            "name": "Zone A",
+            "gefährdungsklasse": "hoch",
+            "berechnete_dichte": 5.0,
+            "loescheinwirkzeit": 35.0,
+            "pumpenredundanz": True,
+        }
+    ],
+    "hydranten": [
+        {
+            "name": "Hydrant 1",
+            "volumenstrom": 250.0,
+            "druck": 0.5,
+        }
+    ],
+    "wasserversorgung": {"dauer": 40.0},
+}
 
-    findings = evaluate(context)
 
-    assert "kg474_Hydrant 1_strom" in finding_ids(findings)
+def base_context() -> Dict[str, object]:
+    return copy.deepcopy(_BASE_CONTEXT)
 
 
-def test_hydrant_flow_positive():
-    context = base_context()
+def _freeze(value: object) -> object:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-    findings = evaluate(context)
 
-    assert "kg474_Hydrant 1_strom" not in finding_ids(findings)
+@pytest.fixture(scope="module")
+def base_context_view() -> Mapping[str, object]:
+    # Auch verschachtelte Listen und Dicts schreibgeschützt (Tupel und MappingProxyType)
+    return _freeze(_BASE_CONTEXT)  # type: ignore[return-value]
 
 
-def test_hydrant_pressure_negative():
-    context = base_context()
-    context["hydranten"][0]["druck"] = 0.3  # type: ignore[index]
+def has_finding(findings: Iterable[object], finding_id: str) -> bool:
+    return any(finding.id == finding_id for finding in findings)  # type: ignore[attr-defined]
 
-    findings = evaluate(context)
 
-    assert "kg474_Hydrant 1_druck" in finding_ids(findings)
+def _assign(context: Dict[str, object], path: Tuple[Union[str, int], ...], value: object) -> None:
+    target: Any = context
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
 
 
-def test_hydrant_pressure_positive():
-    context = base_context()
+def test_requires_any_system_negative():
+    context: Dict[str, object] = {"sprinkler": [], "hydranten": []}
 
     findings = evaluate(context)
 
-    assert "kg474_Hydrant 1_druck" not in finding_ids(findings)
-
-
-def test_global_water_supply_negative():
+    assert [finding.id for finding in findings] == ["kg474_0001"]
+
+
+_NEGATIVE_CASES = (
+    pytest.param(
+        ("sprinkler", 0, "berechnete_dichte"),
+        1.0,
+        "kg474_Zone A_dichte",
+        id="sprinkler-dichte",
+    ),
+    pytest.param(
+        ("sprinkler", 0, "loescheinwirkzeit"),
+        20.0,
+        "kg474_Zone A_dauer",
+        id="sprinkler-dauer",
+    ),
+    pytest.param(
+        ("sprinkler", 0, "pumpenredundanz"),
+        False,
+        "kg474_Zone A_pumpe",
+        id="pumpenredundanz",
+    ),
+    pytest.param(
+        ("hydranten", 0, "volumenstrom"),
+        150.0,
+        "kg474_Hydrant 1_strom",
+        id="hydrant-volumenstrom",
+    ),
+    pytest.param(
+        ("hydranten", 0, "druck"),
+        0.3,
+        "kg474_Hydrant 1_druck",
+        id="hydrant-druck",
+    ),
+    pytest.param(
+        ("wasserversorgung", "dauer"),
+        20.0,
+        "kg474_wasserspeicher",
+        id="wasserversorgung",
+    ),
+)
+
+
+@pytest.mark.parametrize("path,bad_value,expected_id", _NEGATIVE_CASES)
+def test_rule_triggers_for_bad_value(path, bad_value, expected_id):
     context = base_context()
-    context["wasserversorgung"]["dauer"] = 20.0  # type: ignore[index]
+    _assign(context, path, bad_value)
 
     findings = evaluate(context)
 
-    assert "kg474_wasserspeicher" in finding_ids(findings)
+    assert has_finding(findings, expected_id)
 
 
-def test_global_water_supply_positive():
-    context = base_context()
+def test_base_context_has_no_findings(base_context_view):
+    assert evaluate(base_context_view) == []
 
-    findings = evaluate(context)
 
-    assert "kg474_wasserspeicher" not in finding_ids(findings)
+def test_base_context_view_is_read_only_at_every_level(base_context_view):
+    with pytest.raises(TypeError):
+        base_context_view["sprinkler"][0]["name"] = "geändert"  # type: ignore[index]
+    with pytest.raises(AttributeError):
+        base_context_view["sprinkler"].append({})  # type: ignore[attr-defined]
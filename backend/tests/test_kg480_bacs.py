@@ -1,98 +1,103 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable
+import copy
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Tuple, Union
 
-from backend.agent_core.checks.kg480_bacs import evaluate
-
-
-def base_context() -> Dict[str, object]:
-    return {
-        "systeme": [
-            {
-                "gewerk": "kg420",
-                "klasse": "A",
-            }
-        ],
-        "messstellen": [
-            {
-                "kategorie": "hvac",
-                "flaeche": 200.0,
-                "anzahl": 4,
-            }
-        ],
-        "trendaufzeichnung_tage": 45.0,
-        "alarmreaktionszeit": 120.0,
-    }
-
-
-def finding_ids(findings: Iterable[object]) -> set[str]:
-    return {finding.id for finding in findings}  # type: ignore[attr-defined]
-
-
-def test_bacs_class_requirement_worse_triggers_finding():
-    context = base_context()
-    context["systeme"].append({"gewerk": "kg440", "klasse": "C"})  # type: ignore[index]
+import pytest
 
-    findings = evaluate(context)
+from backend.agent_core.checks.kg480_bacs import evaluate
 
-    assert "kg480_kg440_klasse" in finding_ids(findings)
 
+_BASE_CONTEXT: Dict[str, object] = {
+    "systeme": [
+        {
+            "gewerk": "kg420",
+            "klasse": "A",
+        }
+    ],
+    "messstellen": [
+        {
+            "kategorie": "hvac",
+            "flaeche": 200.0,
+            "anzahl": 4,
+        }
+    ],
+    "trendaufzeichnung_tage": 45.0,
+    "alarmreaktionszeit": 120.0,
+}
 
-def test_bacs_class_requirement_better_no_finding():
-    context = base_context()
-    context["systeme"].append({"gewerk": "kg440", "klasse": "A"})  # type: ignore[index]
 
-    findings = evaluate(context)
+def base_context() -> Dict[str, object]:
+    return copy.deepcopy(_BASE_CONTEXT)
 
-    assert "kg480_kg440_klasse" not in finding_ids(findings)
 
+def _freeze(value: object) -> object:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-def test_point_density_negative():
-    context = base_context()
-    context["messstellen"][0]["anzahl"] = 2  # type: ignore[index]
 
-    findings = evaluate(context)
+@pytest.fixture(scope="module")
+def base_context_view() -> Mapping[str, object]:
+    # Auch verschachtelte Listen und Dicts schreibgeschützt (Tupel und MappingProxyType)
+    return _freeze(_BASE_CONTEXT)  # type: ignore[return-value]
 
-    assert "kg480_hvac_punkte" in finding_ids(findings)
 
+def has_finding(findings: Iterable[object], finding_id: str) -> bool:
+    return any(finding.id == finding_id for finding in findings)  # type: ignore[attr-defined]
 
-def test_point_density_positive():
-    context = base_context()
-
-    findings = evaluate(context)
 
-    assert "kg480_hvac_punkte" not in finding_ids(findings)
+def _assign(context: Dict[str, object], path: Tuple[Union[str, int], ...], value: object) -> None:
+    target: Any = context
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
 
 
-def test_trend_storage_negative():
+def test_bacs_class_requirement_worse_triggers_finding():
     context = base_context()
-    context["trendaufzeichnung_tage"] = 10.0
+    context["systeme"].append({"gewerk": "kg440", "klasse": "C"})  # type: ignore[index]
 
     findings = evaluate(context)
 
-    assert "kg480_trendaufzeichnung" in finding_ids(findings)
+    assert has_finding(findings, "kg480_kg440_klasse")
 
 
-def test_trend_storage_positive():
+def test_bacs_class_requirement_better_no_finding():
     context = base_context()
+    context["systeme"].append({"gewerk": "kg440", "klasse": "A"})  # type: ignore[index]
 
     findings = evaluate(context)
 
-    assert "kg480_trendaufzeichnung" not in finding_ids(findings)
+    assert not has_finding(findings, "kg480_kg440_klasse")
 
 
-def test_alarm_response_negative():
+@pytest.mark.parametrize(
+    "path,bad_value,expected_id",
+    (
+        pytest.param(("messstellen", 0, "anzahl"), 2, "kg480_hvac_punkte", id="messpunktdichte"),
+        pytest.param(("trendaufzeichnung_tage",), 10.0, "kg480_trendaufzeichnung", id="trend"),
+        pytest.param(("alarmreaktionszeit",), 400.0, "kg480_alarmzeit", id="alarmzeit"),
+    ),
+)
+def test_rule_triggers_for_bad_value(path, bad_value, expected_id):
     context = base_context()
-    context["alarmreaktionszeit"] = 400.0
+    _assign(context, path, bad_value)
 
     findings = evaluate(context)
 
-    assert "kg480_alarmzeit" in finding_ids(findings)
+    assert has_finding(findings, expected_id)
 
 
-def test_alarm_response_positive():
-    context = base_context()
+def test_base_context_has_no_findings(base_context_view):
+    assert evaluate(base_context_view) == []
 
-    findings = evaluate(context)
 
-    assert "kg480_alarmzeit" not in finding_ids(findings)
+def test_base_context_view_is_read_only_at_every_level(base_context_view):
+    with pytest.raises(TypeError):
+        base_context_view["systeme"][0]["name"] = "geändert"  # type: ignore[index]
+    with pytest.raises(AttributeError):
+        base_context_view["systeme"].append({})  # type: ignore[attr-defined]
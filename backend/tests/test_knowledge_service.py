@@ -0,0 +1,224 @@
+from dataclasses import dataclass, field
+from typing import Any, List
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import (
+    Dokument,
+    GewerkeTypeEnum,
+    KnowledgeChunk,
+    KnowledgeChunkTypeEnum,
+    LeistungsPhaseEnum,
+    ProjectTypeEnum,
+    Projekt,
+)
+from backend.services import knowledge_service
+from backend.services.knowledge_service import KnowledgeBuilder
+from backend.services.rag_service import (
+    EmbeddingCache,
+    EmbeddingResponse,
+    EmbeddingServiceError,
+    deserialize_embedding,
+)
+from database import Base
+
+
+@dataclass(slots=True)
+class _Dokument:
+    id: str = "dok-1"
+    projekt_id: str = "projekt-1"
+
+
+@dataclass(slots=True)
+class _Metadaten:
+    extrahierter_text: str = ""
+    tabellen_daten: List[Any] = field(default_factory=list)
+
+
+class _CountingEmbeddingService:
+    model_name = "test-model"
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, texts):
+        self.batches.append(list(texts))
+        return [EmbeddingResponse(vector=[float(len(text)), 1.0], model=self.model_name) for text in texts]
+
+
+# Wird nur gelesen und deshalb einmal pro Modul aufgebaut
+_GEMISCHTE_TABELLEN = (
+    {"headers": ["Raum", "Heizlast"], "rows": [["R1", 1.5], {"Raum": "R2", "Heizlast": 2}, {"Raum": "R3"}]},
+    {"headers": ["leer"], "rows": []},
+)
+
+
+def _builder(max_chunk_chars: int = 10, chunk_overlap: int = 3) -> KnowledgeBuilder:
+    return KnowledgeBuilder(db=None, max_chunk_chars=max_chunk_chars, chunk_overlap=chunk_overlap)
+
+
+@pytest.mark.parametrize(
+    "text,max_chunk_chars,chunk_overlap,expected",
+    (
+        pytest.param("", 10, 3, [], id="leer"),
+        pytest.param("  Vorlauf\n\t70 °C ", 50, 3, ["Vorlauf 70 °C"], id="whitespace"),
+        pytest.param(
+            "abcdefghijklmnopqrstuvwxyz",
+            10,
+            3,
+            ["abcdefghij", "hijklmnopq", "opqrstuvwx", "vwxyz"],
+            id="overlap",
+        ),
+        # Der Rest "klm" läge vollständig in der Überlappung und entfällt
+        pytest.param("abcdefghijklm", 10, 3, ["abcdefghij", "hijklm"], id="rest-in-overlap"),
+        pytest.param("abcdefg", 3, 0, ["abc", "def", "g"], id="ohne-overlap"),
+        pytest.param("abc", 1, 0, ["a", "b", "c"], id="ein-zeichen"),
+    ),
+)
+def test_split_text(text, max_chunk_chars, chunk_overlap, expected):
+    assert _builder(max_chunk_chars, chunk_overlap)._split_text(text) == expected
+
+
+@pytest.mark.parametrize("chunk_overlap", (100, 150, -1))
+def test_builder_rejects_overlap_not_below_chunk_size(chunk_overlap):
+    # 140 Zeichen bei max=100/overlap=150 ergaben früher stillschweigend []
+    with pytest.raises(ValueError):
+        _builder(max_chunk_chars=100, chunk_overlap=chunk_overlap)
+
+
+def test_iter_table_chunks_renders_list_and_dict_rows():
+    chunks = list(_builder()._iter_table_chunks(_GEMISCHTE_TABELLEN))
+
+    assert len(chunks) == 1
+    assert chunks[0]["text"] == "Raum | Heizlast\nR1 | 1.5\nR2 | 2\nR3 | "
+    assert chunks[0]["metadata"] == {"source": "table", "table_index": 0, "headers": ["Raum", "Heizlast"]}
+
+
+def test_build_chunks_reuses_cached_embeddings():
+    service = _CountingEmbeddingService()
+    builder = KnowledgeBuilder(db=None, embedding_service=service, embedding_cache=EmbeddingCache())
+    dokument = _Dokument()
+    metadata = _Metadaten(extrahierter_text="Heizlast 12 kW")
+
+    first = builder.build_chunks(dokument, metadata)
+    second = builder.build_chunks(dokument, metadata)
+
+    assert service.batches == [["Heizlast 12 kW"]]
+    assert deserialize_embedding(second[0].embedding_vector).tolist() == [14.0, 1.0]
+    assert second[0].embedding_vector == first[0].embedding_vector
+
+
+def test_copy_line_escapes_text_format():
+    chunk = KnowledgeChunk(
+        id="chunk-1",
+        projekt_id="projekt-1",
+        dokument_id="dok-1",
+        chunk_index=0,
+        chunk_type=KnowledgeChunkTypeEnum.TABLE,
+        chunk_text="A | B\nC\tD\\E",
+        source_reference={"source": "table"},
+        embedding_vector=b"\x00\xff",
+    )
+
+    fields = KnowledgeBuilder._copy_line(chunk).rstrip("\n").split("\t")
+
+    assert fields[:6] == ["chunk-1", "projekt-1", "dok-1", "0", "TABLE", "A | B\\nC\\tD\\\\E"]
+    assert fields[6:10] == ['{"source": "table"}', "\\N", "\\\\x00ff", "\\N"]
+
+
+def test_build_chunks_embeds_duplicate_texts_once():
+    service = _CountingEmbeddingService()
+    builder = KnowledgeBuilder(db=None, embedding_service=service, embedding_cache=EmbeddingCache())
+    dokument = _Dokument()
+    header_table = {"headers": ["Raum", "Heizlast"], "rows": [["R1", "1,5"]]}
+    metadata = _Metadaten(tabellen_daten=[header_table, header_table])
+
+    chunks = builder.build_chunks(dokument, metadata)
+
+    assert service.batches == [["Raum | Heizlast\nR1 | 1,5"]]
+    assert len(chunks) == 2
+    assert chunks[0].embedding_vector == chunks[1].embedding_vector
+
+
+def test_attach_embeddings_splits_batches_and_retries(monkeypatch):
+    monkeypatch.setattr(knowledge_service.time, "sleep", lambda seconds: None)
+
+    class FlakyEmbeddingService(_CountingEmbeddingService):
+        def generate_batch(self, texts):
+            if texts == ["ccc", "dddd"] and ["ccc", "dddd"] not in self.batches:
+                self.batches.append(list(texts))
+                raise EmbeddingServiceError("temporär nicht erreichbar")
+            return super().generate_batch(texts)
+
+    service = FlakyEmbeddingService()
+    builder = KnowledgeBuilder(
+        db=None,
+        embedding_service=service,
+        embedding_cache=EmbeddingCache(),
+        embed_batch_size=2,
+    )
+    payloads = [{"chunk_text": text} for text in ["a", "bb", "ccc", "dddd", "eeeee"]]
+
+    builder._attach_embeddings(payloads)
+
+    assert [deserialize_embedding(p["embedding_vector"])[0] for p in payloads] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert service.batches.count(["ccc", "dddd"]) == 2
+
+
+def test_persist_chunks_inserts_in_bounded_batches():
+    class RecordingSession:
+        def __init__(self):
+            self.batch_sizes = []
+
+        def bulk_save_objects(self, objects):
+            self.batch_sizes.append(len(objects))
+
+    session = RecordingSession()
+    builder = KnowledgeBuilder(db=session, embedding_service=None, persist_batch_size=2)
+    chunks = (KnowledgeChunk(chunk_text=str(index)) for index in range(5))
+
+    builder.persist_chunks(chunks)
+
+    assert session.batch_sizes == [2, 2, 1]
+
+
+def test_embed_pending_chunks_fills_vectors_after_persist():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Projekt(id="projekt-1", name="Test", typ=ProjectTypeEnum.OFFICE, leistungsphase=LeistungsPhaseEnum.LP3),
+        Dokument(id="dok-1", projekt_id="projekt-1", filename="a.pdf", file_path="a.pdf",
+                 document_type="plan", gewerk=GewerkeTypeEnum.KG420_HEIZUNG),
+    ])
+    service = _CountingEmbeddingService()
+    builder = KnowledgeBuilder(db=session, embedding_service=service, embedding_cache=EmbeddingCache(),
+                               max_chunk_chars=50, chunk_overlap=10)
+    dokument = _Dokument()
+    metadata = _Metadaten(extrahierter_text="Vorlauf 70 °C")
+
+    builder.persist_chunks(builder.build_chunks(dokument, metadata, embed=False))
+    session.commit()
+
+    assert service.batches == []
+    assert session.query(KnowledgeChunk).one().embedding_status == knowledge_service.EMBEDDING_STATUS_PENDING
+
+    assert builder.embed_pending_chunks("dok-1") == 1
+    assert builder.embed_pending_chunks("dok-1") == 0
+    chunk = session.query(KnowledgeChunk).one()
+    assert chunk.embedding_status == knowledge_service.EMBEDDING_STATUS_DONE
+    assert deserialize_embedding(chunk.embedding_vector).tolist() == [13.0, 1.0]
+
+
+def test_iter_table_chunks_keeps_order_with_process_pool():
+    tables = [{"headers": ["Nr"], "rows": [[index]]} for index in range(20)]
+    builder = KnowledgeBuilder(db=None, embedding_service=None, table_workers=2)
+
+    chunks = list(builder._iter_table_chunks(tables))
+
+    assert [chunk["text"] for chunk in chunks] == [f"Nr\n{index}" for index in range(20)]
+    assert chunks[-1]["metadata"]["table_index"] == 19
@@ -44,21 +44,25 @@ def test_parse_norm_check_response_embedded_json():
     assert result.recommendation == "Entrauchungskonzept nachschärfen"
 
 
-def test_run_norm_check_maps_timeout_to_custom_error():
-    class TimeoutClient:
-        def generate(self, prompt: str) -> str:  # pragma: no cover - executed in test
-            raise TimeoutError("request timed out")
+# Nachbildung der RateLimitError-Klassen der LLM-SDKs, erkannt am Klassennamen
+RateLimitError = type("RateLimitError", (Exception,), {})
 
-    with pytest.raises(LLMTimeoutError):
-        run_norm_check("Büro", "Lüftung", "Test", llm_client=TimeoutClient())
 
+class _RaisingClient:
+    def __init__(self, error: Exception) -> None:
+        self._error = error
 
-def test_run_norm_check_maps_rate_limit_to_custom_error():
-    RateLimitError = type("RateLimitError", (Exception,), {})
+    def generate(self, prompt: str) -> str:  # pragma: no cover - executed in test
+        raise self._error
 
-    class RateLimitClient:
-        def generate(self, prompt: str) -> str:  # pragma: no cover - executed in test
-            raise RateLimitError("rate limit")
 
-    with pytest.raises(LLMRateLimitError):
-        run_norm_check("Büro", "Lüftung", "Test", llm_client=RateLimitClient())
+@pytest.mark.parametrize(
+    "error,expected",
+    (
+        pytest.param(TimeoutError("request timed out"), LLMTimeoutError, id="timeout"),
+        pytest.param(RateLimitError("rate limit"), LLMRateLimitError, id="rate-limit"),
+    ),
+)
+def test_run_norm_check_maps_client_errors(error, expected):
+    with pytest.raises(expected):
+        run_norm_check("Büro", "Lüftung", "Test", llm_client=_RaisingClient(error))
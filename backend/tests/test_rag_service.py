@@ -0,0 +1,158 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import (
+    Dokument,
+    EmbeddingCacheEntry,
+    GewerkeTypeEnum,
+    KnowledgeChunk,
+    KnowledgeChunkTypeEnum,
+    LeistungsPhaseEnum,
+    ProjectTypeEnum,
+    Projekt,
+)
+from backend.services.rag_service import (
+    EmbeddingCache,
+    EmbeddingService,
+    EmbeddingServiceError,
+    deserialize_embedding,
+    embedding_cache_key,
+    migrate_json_embeddings,
+    serialize_embedding,
+)
+from database import Base
+
+
+def test_embedding_roundtrip_uses_packed_float32():
+    payload = serialize_embedding([0.5, -1.25, 3.0])
+
+    assert isinstance(payload, bytes)
+    assert len(payload) == 3 * 4
+    assert deserialize_embedding(payload).tolist() == [0.5, -1.25, 3.0]
+
+
+def test_deserialize_embedding_reads_legacy_json():
+    assert deserialize_embedding("[0.5, 1]").tolist() == [0.5, 1.0]
+    assert deserialize_embedding(None) is None
+
+
+def test_deserialize_embedding_rejects_truncated_bytes():
+    with pytest.raises(EmbeddingServiceError):
+        deserialize_embedding(b"\x00\x00\x80")
+
+
+class _FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload or {}).encode()
+        self.text = ""
+
+
+def test_generate_batch_reads_openai_compatible_payload():
+    payload = {"data": [{"index": 1, "embedding": [2.0]}, {"index": 0, "embedding": [1.0]}]}
+    session = SimpleNamespace(post=lambda *args, **kwargs: _FakeResponse(200, payload))
+
+    responses = EmbeddingService("http://ollama", "model", session=session).generate_batch(["a", "b"])
+
+    assert [response.vector for response in responses] == [[1.0], [2.0]]
+
+
+def test_generate_batch_falls_back_to_single_requests():
+    calls = []
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append(url)
+        if url.endswith("/api/embed"):
+            return _FakeResponse(404)
+        return _FakeResponse(200, {"embedding": [float(len(json["prompt"]))]})
+
+    session = SimpleNamespace(post=fake_post)
+
+    responses = EmbeddingService("http://ollama", "model", session=session).generate_batch(["a", "bb"])
+
+    assert [response.vector for response in responses] == [[1.0], [2.0]]
+    assert calls == ["http://ollama/api/embed", "http://ollama/api/embeddings", "http://ollama/api/embeddings"]
+
+
+def test_embedding_cache_persists_vectors_across_instances():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    EmbeddingCacheEntry.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    key = embedding_cache_key("nomic-embed-text:latest", "Heizlast")
+
+    EmbeddingCache().set_many({key: [0.25, 0.5]}, session=session)
+    EmbeddingCache().set_many({key: [0.25, 0.5]}, session=session)
+    session.commit()
+    cache = EmbeddingCache()
+
+    found = cache.get_many([key, "emb:m:unbekannt"], session=session)
+    assert {k: v.tolist() for k, v in found.items()} == {key: [0.25, 0.5]}
+    assert (cache.cache_hits, cache.cache_misses) == (1, 1)
+    entry = session.get(EmbeddingCacheEntry, key)
+    assert (entry.model, entry.dimensions) == ("nomic-embed-text:latest", 2)
+
+
+def test_embedding_cache_lookup_failure_keeps_caller_transaction():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Projekt.__table__.create(engine)  # embedding_cache fehlt, die Abfrage schlägt fehl
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    session.add(Projekt(id="projekt-1", name="Test", typ=ProjectTypeEnum.OFFICE, leistungsphase=LeistungsPhaseEnum.LP3))
+    session.flush()
+
+    assert EmbeddingCache().get_many(["emb:m:x"], session=session) == {}
+    session.commit()
+
+    assert any(statement.startswith("ROLLBACK TO SAVEPOINT") for statement in statements)
+    assert session.get(Projekt, "projekt-1") is not None
+
+
+def test_migrate_json_embeddings_rewrites_legacy_rows_once():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Projekt(id="projekt-1", name="Test", typ=ProjectTypeEnum.OFFICE, leistungsphase=LeistungsPhaseEnum.LP3),
+        Dokument(id="dok-1", projekt_id="projekt-1", filename="a.pdf", file_path="a.pdf",
+                 document_type="plan", gewerk=GewerkeTypeEnum.KG420_HEIZUNG),
+    ])
+    for chunk_id, vector in [("legacy", b"[0.5, 2]"), ("packed", serialize_embedding([1.5]))]:
+        session.add(KnowledgeChunk(id=chunk_id, projekt_id="projekt-1", dokument_id="dok-1", chunk_index=0,
+                                   chunk_type=KnowledgeChunkTypeEnum.TEXT, chunk_text="x", embedding_vector=vector))
+    session.commit()
+
+    assert migrate_json_embeddings(session, batch_size=1) == 1
+    assert migrate_json_embeddings(session, batch_size=1) == 0
+    assert session.get(KnowledgeChunk, "legacy").embedding_vector == serialize_embedding([0.5, 2.0])
+    assert session.get(KnowledgeChunk, "packed").embedding_vector == serialize_embedding([1.5])
+
+
+def test_generate_batch_packs_requests_within_limits():
+    requests_sent = []
+
+    def fake_post(url, json=None, timeout=None):
+        requests_sent.append(json["input"])
+        return _FakeResponse(200, {"embeddings": [[float(len(text))] for text in json["input"]]})
+
+    service = EmbeddingService(
+        "http://ollama", "model", session=SimpleNamespace(post=fake_post), max_batch_chars=6, max_batch_items=2
+    )
+
+    responses = service.generate_batch(["aa", "bb", "c", "dddddddd", "e"])
+
+    assert requests_sent == [["aa", "bb"], ["c"], ["dddddddd"], ["e"]]
+    assert [response.vector for response in responses] == [[2.0], [2.0], [1.0], [8.0], [1.0]]
+
+
+def test_embedding_services_share_pooled_session():
+    first = EmbeddingService("http://ollama", "model")
+    second = EmbeddingService("http://other", "model")
+
+    assert first.session is second.session
+    assert first.session.get_adapter("http://ollama").max_retries.total == 3
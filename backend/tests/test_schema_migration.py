@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from backend.services.schema_migration import upgrade_schema
+
+
+# Tabellen im Stand vor Status-, Hash- und Embedding-Status-Spalte (gekürzt)
+_ALTES_SCHEMA = (
+    "CREATE TABLE dokumente (id VARCHAR PRIMARY KEY, projekt_id VARCHAR NOT NULL, erstellt_am DATETIME)",
+    "CREATE TABLE knowledge_chunks (id VARCHAR PRIMARY KEY, embedding_vector TEXT)",
+    "INSERT INTO dokumente (id, projekt_id) VALUES ('dok-1', 'projekt-1')",
+    "INSERT INTO knowledge_chunks (id, embedding_vector) VALUES ('c1', '[1.0]'), ('c2', NULL)",
+)
+
+
+def _altes_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        for statement in _ALTES_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes_once():
+    engine = _altes_engine()
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert {"status", "content_sha256"} <= {c["name"] for c in inspector.get_columns("dokumente")}
+    assert {i["name"] for i in inspector.get_indexes("dokumente")} == {
+        "ix_dokument_projekt_erstellt",
+        "ix_dokumente_content_sha256",
+    }
+    assert {i["name"] for i in inspector.get_indexes("knowledge_chunks")} == {
+        "ix_knowledge_chunks_embedding_status"
+    }
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT status FROM dokumente")).scalar_one() == "indexed"
+        assert conn.execute(
+            text("SELECT id, embedding_status FROM knowledge_chunks ORDER BY id")
+        ).all() == [("c1", "done"), ("c2", "pending")]
+
+
+def test_upgrade_schema_skips_missing_tables():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    upgrade_schema(engine)
+
+    assert inspect(engine).get_table_names() == []